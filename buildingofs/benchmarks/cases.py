@@ -0,0 +1,148 @@
+import cPickle as pickle
+import datetime
+import os
+import subprocess
+import sys
+
+from django.core.cache import cache
+from django.template import Context, Template
+from django.template.response import TemplateResponse
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
+from django.utils import timezone
+
+import buildingofs
+from buildingofs.blog.models import Post
+from buildingofs.blog.pagination import Page
+from buildingofs.ofsapi.fake import synthetic_staff
+from buildingofs.staff.models import Staff
+from buildingofs.utils.managers import SimpleManager
+
+from .suite import benchmark, BYTES
+
+
+# imports the models every command and worker boot imports, failing if
+# that sets up the platform proxy
+IMPORT_SCRIPT = '''
+from buildingofs.blog import models
+from buildingofs.staff import models
+from buildingofs import ofsapi
+from django.utils.functional import empty
+if ofsapi.rpc._wrapped is not empty:
+    raise SystemExit("the platform proxy was set up at import")
+'''
+
+
+@benchmark('import_models')
+def import_models():
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='buildingofs.settings')
+    cwd = os.path.dirname(os.path.dirname(os.path.abspath(buildingofs.__file__)))
+    return lambda: subprocess.check_call([sys.executable, '-c', IMPORT_SCRIPT], env=env, cwd=cwd)
+
+
+@benchmark('rpcmodel_init', sizes=(100, 10000))
+def rpcmodel_init(size):
+    rows = synthetic_staff(size)
+    return lambda: map(Staff, rows)
+
+
+@benchmark('convert_filters', number=1000)
+def convert_filters():
+    filters = {
+        'id__gte': 20,
+        'id__lte': 2000,
+        'first_name__contains': 'ali',
+        'username': 'alice.adams1',
+        'job_title__in': ['Engineer', 'Designer'],
+    }
+    return lambda: Staff.objects.convert_filters(filters)
+
+
+@benchmark('simple_manager_filter', sizes=(100, 10000))
+def simple_manager_filter(size):
+    manager = SimpleManager(Staff, synthetic_staff(size))
+    return lambda: list(manager.filter(job_title='Engineer', is_enabled=True))
+
+
+@benchmark('manager_filter', sizes=(100, 10000))
+def manager_filter(size):
+    return lambda: Staff.objects.filter(id__lte=size)
+
+
+@benchmark('cached_hit', number=100)
+def cached_hit():
+    Staff.objects.cached(id=1)
+    return lambda: Staff.objects.cached(id=1)
+
+
+@benchmark('cached_miss', number=100)
+def cached_miss():
+    key = Staff.objects._cache_key(id=1)
+
+    def func():
+        cache.delete(key)
+        Staff.objects.cached(id=1)
+    return func
+
+
+@benchmark('cached_pickle_size', unit=BYTES, sizes=(1, 1000))
+def cached_pickle_size(size):
+    objects = Staff.objects.filter(id__lte=size)
+    return lambda: len(pickle.dumps(objects, pickle.HIGHEST_PROTOCOL))
+
+
+def _posts(count):
+    now = timezone.now()
+    post_types = [t for t, _ in Post.POST_TYPES]
+    posts = []
+    for i in xrange(count):
+        posts.append(Post(
+            id=i + 1,
+            slug='post-{}'.format(i),
+            title='Post {}'.format(i),
+            post_type=post_types[i % len(post_types)],
+            summary='Summary of post {}'.format(i),
+            live=True,
+            body_markdown='Some *body* text',
+            body_html='<p>Some <em>body</em> text</p>',
+            link='http://example.com/{}'.format(i),
+            link_text='Example {}'.format(i),
+            created_at=now,
+            modified_at=now,
+            published_at=now - datetime.timedelta(days=i),
+        ))
+    return posts
+
+
+@benchmark('homepage_render', sizes=(10, 50))
+def homepage_render(size):
+    request = RequestFactory().get('/')
+    context = {'page': Page(_posts(size))}
+
+    @override_settings(PIPELINE_ENABLED=True)
+    def func():
+        TemplateResponse(request, 'homepage.html', context).render()
+    return func
+
+
+@benchmark('permission_checks', number=1000)
+def permission_checks():
+    user = Staff(synthetic_staff(1)[0])
+    required = frozenset(['staff.view', 'homes.view'])
+
+    def func():
+        user.has_perm('staff.view')
+        user.has_perms(required)
+        user.has_any_perm(required)
+    return func
+
+
+@benchmark('render_post_uncached', sizes=(50,))
+def render_post_uncached(size):
+    posts = _posts(size)
+    for post in posts:
+        # unsaved posts skip the fragment cache
+        post.id = None
+    template = Template('{% load blog_tags %}{% for post in posts %}{% render_post post %}{% endfor %}')
+    context = Context({'posts': posts})
+    return lambda: template.render(context)
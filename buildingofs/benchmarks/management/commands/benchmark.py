@@ -0,0 +1,97 @@
+import os
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from buildingofs import ofsapi
+from buildingofs.ofsapi.fake import FakeRPCProxy, build_platform
+from buildingofs.benchmarks import suite
+
+DEFAULT_BASELINE = os.path.join(
+    os.path.dirname(suite.__file__), 'baseline.json'
+)
+
+
+class Command(BaseCommand):
+    help = ("Benchmark the RPC model, manager, cache and rendering hot paths "
+            "against a local fake platform. Run with "
+            "--settings=buildingofs.settings.bench.")
+    args = "[benchmark name prefix ...]"
+    option_list = BaseCommand.option_list + (
+        make_option('--save', action='store_true', dest='save', default=False,
+                    help="Store the results as the new baseline."),
+        make_option('--compare', action='store_true', dest='compare',
+                    default=False,
+                    help="Compare the results with the baseline and fail on "
+                         "regressions."),
+        make_option('--baseline', dest='baseline', default=DEFAULT_BASELINE,
+                    help="Baseline file to save to or compare with."),
+        make_option('--threshold', dest='threshold', type='float',
+                    default=0.25,
+                    help="Allowed slowdown before a benchmark is flagged, "
+                         "0.25 means 25%."),
+        make_option('--repeat', dest='repeat', type='int', default=5,
+                    help="Number of runs to take the best timing from."),
+        make_option('--rows', dest='rows', type='int', default=10000,
+                    help="Size of the fake staff directory."),
+        make_option('--latency', dest='latency', type='float', default=0,
+                    help="Seconds of latency added to each fake RPC call."),
+    )
+
+    def handle(self, *names, **options):
+        platform = build_platform({
+            'latency': options['latency'],
+            'datasets': {'staff': options['rows']},
+        })
+        previous = ofsapi.install(FakeRPCProxy(platform))
+
+        # registers the benchmarks
+        from buildingofs.benchmarks import cases  # noqa
+
+        try:
+            # measure the production code paths
+            with override_settings(DEBUG=False):
+                results = suite.run(names, repeat=options['repeat'],
+                                    callback=self.report)
+        finally:
+            ofsapi.install(previous)
+
+        if options['save']:
+            baseline = {}
+            if names and os.path.exists(options['baseline']):
+                baseline = suite.load(options['baseline'])
+            baseline.update(results)
+            suite.save(options['baseline'], baseline)
+            self.stdout.write("Saved baseline to {}".format(options['baseline']))
+
+        if options['compare']:
+            self.compare(results, options['baseline'], options['threshold'])
+
+    def report(self, name, result):
+        self.stdout.write("{:<40} {}".format(name, self.format(result['value'], result['unit'])))
+
+    def format(self, value, unit):
+        if unit == suite.SECONDS:
+            return "{:>12.3f} ms".format(value * 1000)
+        return "{:>12} {}".format(value, unit)
+
+    def compare(self, results, path, threshold):
+        if not os.path.exists(path):
+            raise CommandError("No baseline at {}, run with --save first".format(path))
+
+        baseline = suite.load(path)
+        regressions = []
+        self.stdout.write("\n{:<40} {:>15} {:>15} {:>8}".format(
+            "benchmark", "baseline", "current", "ratio"))
+        for name, before, after, ratio, regressed in suite.compare(baseline, results, threshold):
+            unit = results[name]['unit']
+            self.stdout.write("{:<40} {} {} {:>7.2f}x{}".format(
+                name, self.format(before, unit), self.format(after, unit),
+                ratio, "  REGRESSION" if regressed else ""))
+            if regressed:
+                regressions.append(name)
+
+        if regressions:
+            raise CommandError("{} benchmark(s) regressed by more than {:.0%}: {}".format(
+                len(regressions), threshold, ', '.join(regressions)))
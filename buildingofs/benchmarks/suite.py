@@ -0,0 +1,109 @@
+import json
+from timeit import default_timer
+
+SECONDS = 's'
+BYTES = 'bytes'
+
+registry = []
+
+
+class Benchmark(object):
+    """
+    A named measurement. setup(size) returns the callable to measure, for
+    BYTES benchmarks the callable returns the size to record.
+    """
+
+    def __init__(self, name, setup, unit=SECONDS, number=1, size=None):
+        self.name = name
+        self.setup = setup
+        self.unit = unit
+        self.number = number
+        self.size = size
+
+    def run(self, repeat=5):
+        if self.size is None:
+            func = self.setup()
+        else:
+            func = self.setup(self.size)
+
+        if self.unit == BYTES:
+            return func()
+
+        timings = []
+        for _ in xrange(repeat):
+            start = default_timer()
+            for _ in xrange(self.number):
+                func()
+            timings.append((default_timer() - start) / self.number)
+        return min(timings)
+
+
+def benchmark(name, unit=SECONDS, number=1, sizes=None):
+    """
+    Register a benchmark setup function
+
+        @benchmark('rpcmodel_init', sizes=(100, 10000))
+        def rpcmodel_init(size):
+            rows = ...
+            return lambda: map(Staff, rows)
+
+    Sized benchmarks are registered once per size as 'name.size'
+    """
+    def decorator(setup):
+        if sizes is None:
+            registry.append(Benchmark(name, setup, unit, number))
+        else:
+            for size in sizes:
+                registry.append(Benchmark('{}.{}'.format(name, size), setup,
+                                          unit, number, size))
+        return setup
+    return decorator
+
+
+def run(names=None, repeat=5, callback=None):
+    """
+    Run registered benchmarks, optionally only those whose name starts
+    with one of names
+
+    Returns {name: {'value': value, 'unit': unit}}
+    """
+    results = {}
+    for bench in registry:
+        if names and not any(bench.name.startswith(n) for n in names):
+            continue
+        results[bench.name] = {
+            'value': bench.run(repeat=repeat),
+            'unit': bench.unit,
+        }
+        if callback:
+            callback(bench.name, results[bench.name])
+    return results
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save(path, results):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True, separators=(',', ': '))
+        f.write('\n')
+
+
+def compare(baseline, results, threshold=0.1):
+    """
+    Compare results to a baseline, lower is better for every unit
+
+    Returns a list of (name, baseline value, value, ratio, regressed)
+    sorted by name. Benchmarks missing from the baseline are skipped.
+    """
+    comparison = []
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        before = baseline[name]['value']
+        after = results[name]['value']
+        ratio = float(after) / before if before else float('inf') if after else 1.0
+        comparison.append((name, before, after, ratio, ratio > 1 + threshold))
+    return comparison
@@ -0,0 +1,29 @@
+from django.test import SimpleTestCase
+
+from . import suite
+
+
+class CompareTest(SimpleTestCase):
+
+    def compare(self, before, after, unit=suite.BYTES):
+        baseline = {'bench': {'value': before, 'unit': unit}}
+        results = {'bench': {'value': after, 'unit': unit}}
+        return suite.compare(baseline, results, threshold=0.1)[0]
+
+    def test_integer_regression_is_flagged(self):
+        name, before, after, ratio, regressed = self.compare(1000, 1900)
+        self.assertAlmostEqual(ratio, 1.9)
+        self.assertTrue(regressed)
+
+    def test_within_threshold(self):
+        name, before, after, ratio, regressed = self.compare(1000, 1050)
+        self.assertAlmostEqual(ratio, 1.05)
+        self.assertFalse(regressed)
+
+    def test_from_zero(self):
+        self.assertTrue(self.compare(0, 10)[4])
+        self.assertFalse(self.compare(0, 0)[4])
+
+    def test_missing_from_baseline_skipped(self):
+        results = {'new': {'value': 1, 'unit': suite.SECONDS}}
+        self.assertEqual(suite.compare({}, results), [])
@@ -0,0 +1,189 @@
+"""
+Cache helpers for blog pages.
+
+Listings are keyed on a content version that changes whenever a post is
+saved or deleted, and on TEMPLATE_VERSION, so nothing has to be deleted
+explicitly. The version
+also carries the time of the last change, which views use for
+Last-Modified. Single posts are keyed on their own modified_at.
+
+The version is bumped, and slug lookups of the post dropped, by the
+blog's worker thread once the change is committed (see rendering.defer).
+Doing it from inside save() would let a request that still sees the old
+rows cache them again, or cache a save that is then rolled back.
+
+Versions only invalidate anything when every process sees the same
+cache, CACHES must be a shared backend such as memcached.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+
+CONTENT_VERSION_KEY = 'blog.content-version'
+
+# bump when the blog templates change so cached renderings are rebuilt
+TEMPLATE_VERSION = 3
+
+# cached for slugs without a post, so misses don't reach the database
+MISSING = False
+
+
+def _new_state(last_modified):
+    return {
+        'version': uuid.uuid4().hex,
+        'last_modified': last_modified,
+    }
+
+
+def get_content_state():
+    """
+    Returns {'version': ..., 'last_modified': ...} for the blog's content
+    """
+    state = cache.get(CONTENT_VERSION_KEY)
+    if state is None:
+        from .models import Post
+
+        last_modified = Post.objects.filter(live=True).aggregate(
+            last_modified=Max('modified_at'))['last_modified']
+        state = _new_state(last_modified or timezone.now())
+        if not cache.add(CONTENT_VERSION_KEY, state, None):
+            # someone else got there first, use theirs
+            state = cache.get(CONTENT_VERSION_KEY, state)
+    return state
+
+
+def bump_content_version(modified_at=None):
+    """
+    Invalidate everything keyed on the content version
+    """
+    cache.set(CONTENT_VERSION_KEY,
+              _new_state(modified_at or timezone.now()), None)
+
+
+def content_saved(post_id, modified_at, slugs=()):
+    """
+    Background job bumping the content version and dropping the slug
+    lookups of a saved post, False until the database shows the save
+    """
+    from .models import Post
+
+    # the database may not keep microseconds
+    if not Post.objects.filter(pk=post_id,
+                               modified_at__gte=modified_at.replace(microsecond=0)).exists():
+        return False
+    bump_content_version(modified_at)
+    cache.delete_many([_slug_key(slug) for slug in slugs if slug])
+    return True
+
+
+def content_deleted(post_id, slug):
+    """
+    Background job bumping the content version and dropping the slug
+    lookup of a deleted post, False until the database shows the delete
+    """
+    from .models import Post
+
+    if Post.objects.filter(pk=post_id).exists():
+        return False
+    bump_content_version()
+    cache.delete(_slug_key(slug))
+    return True
+
+
+def content_etag(request, *args, **kwargs):
+    return '{}-{}'.format(TEMPLATE_VERSION, get_content_state()['version'])
+
+
+def content_last_modified(request, *args, **kwargs):
+    return get_content_state()['last_modified']
+
+
+def versioned_key(name, *parts):
+    """
+    Key for a page built from the blog's content, rebuilt when a post
+    changes or the templates do
+    """
+    version = get_content_state()['version']
+    return '-'.join(['blog.{}{}'.format(name, TEMPLATE_VERSION), version] +
+                    [unicode(part) for part in parts])
+
+
+def fragment_key(post):
+    """
+    Key for a post's rendered snippet, None for unsaved posts
+    """
+    if post.pk is None or post.modified_at is None:
+        return None
+    return 'blog.fragment{}-{}-{}-{}'.format(
+        TEMPLATE_VERSION, post.pk, post.post_type, post.modified_at.isoformat())
+
+
+def post_page_key(post):
+    return 'blog.post-page{}-{}-{}'.format(
+        TEMPLATE_VERSION, post.pk, post.modified_at.isoformat())
+
+
+def _slug_key(slug):
+    return 'blog.post-slug-{}'.format(slug)
+
+
+def get_post_by_slug(slug):
+    """
+    Return the post with slug, or None, going to the database only the
+    first time a slug is asked for
+    """
+    from .models import Post
+
+    key = _slug_key(slug)
+    post = cache.get(key)
+    if post is None:
+        try:
+            post = Post.objects.defer('body_markdown').get(slug=slug)
+        except Post.DoesNotExist:
+            post = MISSING
+        cache.set(key, post, settings.BLOG_CACHE_TIMEOUT)
+
+    # memcached hands False back as 0
+    if post == MISSING:
+        return None
+    return post
+
+
+def cache_post(post):
+    """
+    Store a committed post for slug lookups
+    """
+    cache.set(_slug_key(post.slug), post, settings.BLOG_CACHE_TIMEOUT)
+
+
+def post_etag(request, slug):
+    post = get_post_by_slug(slug)
+    if post is None:
+        return None
+    return '{}-{}-{}'.format(TEMPLATE_VERSION, post.pk,
+                             post.modified_at.strftime('%Y%m%d%H%M%S%f'))
+
+
+def post_last_modified(request, slug):
+    post = get_post_by_slug(slug)
+    if post is None:
+        return None
+    return post.modified_at
+
+
+def get_or_render(key, render):
+    """
+    Return the cached value for key, calling render() to build and store
+    it on a miss
+    """
+    if key is None:
+        return render()
+
+    value = cache.get(key)
+    if value is None:
+        value = render()
+        cache.set(key, value, settings.BLOG_CACHE_TIMEOUT)
+    return value
@@ -0,0 +1,134 @@
+"""
+Atom and RSS feeds of live posts.
+
+Each entry is rendered on its own and cached on the post's modified_at,
+so a feed rebuild only renders entries that changed. The whole document
+is cached on the blog content version and streamed while it's built.
+"""
+from cStringIO import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import feedgenerator
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.utils.xmlutils import SimplerXMLGenerator
+from django.views.decorators.http import condition
+from django.views.generic import View
+
+from .cache import (TEMPLATE_VERSION, content_etag, content_last_modified,
+                    get_content_state, get_or_render, versioned_key)
+from .models import Post, FEED_DEFERRED_FIELDS
+
+ITEMS_MARKER = u'<!--items-->'
+ENCODING = 'utf-8'
+
+
+class IncrementalFeedMixin(object):
+    """
+    Splits a feed generator's output into a frame and separately
+    rendered items
+    """
+    item_element = None
+
+    def latest_post_date(self):
+        return self.feed['updated']
+
+    def write_items(self, handler):
+        handler.ignorableWhitespace(ITEMS_MARKER)
+
+    def frame(self):
+        """
+        Returns the document before and after the items
+        """
+        head, tail = self.writeString(ENCODING).split(ITEMS_MARKER.encode(ENCODING))
+        return head, tail
+
+    def render_item(self, item):
+        out = StringIO()
+        handler = SimplerXMLGenerator(out, ENCODING)
+        handler.startElement(self.item_element, self.item_attributes(item))
+        self.add_item_elements(handler, item)
+        handler.endElement(self.item_element)
+        return out.getvalue()
+
+
+class AtomFeed(IncrementalFeedMixin, feedgenerator.Atom1Feed):
+    item_element = 'entry'
+
+
+class RssFeed(IncrementalFeedMixin, feedgenerator.Rss201rev2Feed):
+    item_element = 'item'
+
+
+class PostFeedView(View):
+    feed_class = AtomFeed
+    feed_name = 'atom'
+
+    def get_feed(self, request):
+        return self.feed_class(
+            title="building onefinestay",
+            link=request.build_absolute_uri(reverse('home')),
+            description="building onefinestay",
+            language=settings.LANGUAGE_CODE,
+            feed_url=request.build_absolute_uri(),
+            updated=get_content_state()['last_modified'],
+        )
+
+    def get_posts(self):
+        posts = Post.objects.filter(live=True).defer(*FEED_DEFERRED_FIELDS)
+        return posts.order_by('-published_at', '-id')[:settings.BLOG_FEED_SIZE].iterator()
+
+    def render_entry(self, request, feed, post):
+        def render():
+            link = request.build_absolute_uri(post.get_absolute_url())
+            feed.add_item(
+                title=post.title,
+                link=link,
+                description=post.summary,
+                unique_id=link,
+                pubdate=post.published_at,
+            )
+            return feed.render_item(feed.items.pop())
+
+        # links are absolute, so they differ by scheme and host
+        key = 'blog.feed{}-{}-{}-{}-{}-{}'.format(
+            TEMPLATE_VERSION, self.feed_name, request.is_secure(), request.get_host(),
+            post.pk, post.modified_at.isoformat())
+        return get_or_render(key, render)
+
+    def stream(self, request, key):
+        feed = self.get_feed(request)
+        head, tail = feed.frame()
+        chunks = [head]
+        yield head
+
+        for post in self.get_posts():
+            entry = self.render_entry(request, feed, post)
+            chunks.append(entry)
+            yield entry
+
+        chunks.append(tail)
+        yield tail
+
+        cache.set(key, ''.join(chunks), settings.BLOG_CACHE_TIMEOUT)
+
+    @method_decorator(condition(etag_func=content_etag,
+                                last_modified_func=content_last_modified))
+    def get(self, request):
+        key = versioned_key('feed', self.feed_name, request.is_secure(), request.get_host())
+        content = cache.get(key)
+        if content is not None:
+            response = HttpResponse(content, content_type=self.feed_class.mime_type)
+        else:
+            response = StreamingHttpResponse(self.stream(request, key),
+                                             content_type=self.feed_class.mime_type)
+        patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+        return response
+
+
+class PostRssFeedView(PostFeedView):
+    feed_class = RssFeed
+    feed_name = 'rss'
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from buildingofs.blog import search
+
+
+class Command(BaseCommand):
+    help = ("Bring the search index up to date with every post and drop "
+            "unused terms.")
+
+    def handle(self, *args, **options):
+        count = search.reindex()
+        if int(options['verbosity']):
+            self.stdout.write("Indexed {} posts.".format(count))
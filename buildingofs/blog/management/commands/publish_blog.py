@@ -0,0 +1,30 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from buildingofs.blog import publish
+
+
+class Command(BaseCommand):
+    help = ("Publish static copies of the homepage and live posts to "
+            "BLOG_PUBLISH_ROOT, rebuilding only pages that are out of date.")
+    option_list = BaseCommand.option_list + (
+        make_option('--force', action='store_true', dest='force', default=False,
+                    help="Republish every live post."),
+    )
+
+    def handle(self, *args, **options):
+        if not publish.enabled():
+            raise CommandError("BLOG_PUBLISH_ROOT is not set.")
+
+        published, removed = publish.publish_all(force=options['force'])
+
+        verbosity = int(options['verbosity'])
+        if verbosity > 1:
+            for slug in published:
+                self.stdout.write("Published {}".format(slug))
+            for slug in removed:
+                self.stdout.write("Removed {}".format(slug))
+        if verbosity:
+            self.stdout.write("Published {} posts, removed {}.".format(
+                len(published), len(removed)))
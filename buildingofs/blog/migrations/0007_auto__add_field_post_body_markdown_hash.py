@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from south.utils import datetime_utils as datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        # Adding field 'Post.body_markdown_hash'
+        db.add_column(u'blog_post', 'body_markdown_hash',
+                      self.gf('django.db.models.fields.CharField')(default='', max_length=40, blank=True),
+                      keep_default=False)
+
+
+    def backwards(self, orm):
+        # Deleting field 'Post.body_markdown_hash'
+        db.delete_column(u'blog_post', 'body_markdown_hash')
+
+
+    models = {
+        u'blog.post': {
+            'Meta': {'object_name': 'Post'},
+            'author_id': ('django.db.models.fields.IntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'body_html': ('django.db.models.fields.TextField', [], {'blank': 'True'}),
+            'body_markdown': ('django.db.models.fields.TextField', [], {'blank': 'True'}),
+            'body_markdown_hash': ('django.db.models.fields.CharField', [], {'max_length': '40', 'blank': 'True'}),
+            'created_at': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'discussion_link': ('django.db.models.fields.URLField', [], {'max_length': '200', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'link': ('django.db.models.fields.URLField', [], {'max_length': '255', 'blank': 'True'}),
+            'link_text': ('django.db.models.fields.CharField', [], {'max_length': '255', 'blank': 'True'}),
+            'live': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'modified_at': ('django.db.models.fields.DateTimeField', [], {'auto_now': 'True', 'blank': 'True'}),
+            'post_type': ('django.db.models.fields.CharField', [], {'default': "'blog'", 'max_length': '15'}),
+            'published_at': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'slug': ('django.db.models.fields.SlugField', [], {'unique': 'True', 'max_length': '255'}),
+            'summary': ('django.db.models.fields.TextField', [], {}),
+            'title': ('django.db.models.fields.TextField', [], {})
+        }
+    }
+
+    complete_apps = ['blog']
\ No newline at end of file
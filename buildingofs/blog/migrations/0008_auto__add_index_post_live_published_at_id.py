@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from south.utils import datetime_utils as datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        # Live posts are now listed by published_at, give the ones missing
+        # it their creation date
+        if not db.dry_run:
+            orm['blog.Post'].objects.filter(live=True, published_at__isnull=True).update(
+                published_at=models.F('created_at'))
+
+        # Adding index on 'Post', fields ['live', 'published_at', u'id']
+        db.create_index(u'blog_post', ['live', 'published_at', u'id'])
+
+
+    def backwards(self, orm):
+        # Removing index on 'Post', fields ['live', 'published_at', u'id']
+        db.delete_index(u'blog_post', ['live', 'published_at', u'id'])
+
+
+    models = {
+        u'blog.post': {
+            'Meta': {'object_name': 'Post', 'index_together': "[('live', 'published_at', 'id')]"},
+            'author_id': ('django.db.models.fields.IntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'body_html': ('django.db.models.fields.TextField', [], {'blank': 'True'}),
+            'body_markdown': ('django.db.models.fields.TextField', [], {'blank': 'True'}),
+            'body_markdown_hash': ('django.db.models.fields.CharField', [], {'max_length': '40', 'blank': 'True'}),
+            'created_at': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'discussion_link': ('django.db.models.fields.URLField', [], {'max_length': '200', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'link': ('django.db.models.fields.URLField', [], {'max_length': '255', 'blank': 'True'}),
+            'link_text': ('django.db.models.fields.CharField', [], {'max_length': '255', 'blank': 'True'}),
+            'live': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'modified_at': ('django.db.models.fields.DateTimeField', [], {'auto_now': 'True', 'blank': 'True'}),
+            'post_type': ('django.db.models.fields.CharField', [], {'default': "'blog'", 'max_length': '15'}),
+            'published_at': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'slug': ('django.db.models.fields.SlugField', [], {'unique': 'True', 'max_length': '255'}),
+            'summary': ('django.db.models.fields.TextField', [], {}),
+            'title': ('django.db.models.fields.TextField', [], {})
+        }
+    }
+
+    complete_apps = ['blog']
\ No newline at end of file
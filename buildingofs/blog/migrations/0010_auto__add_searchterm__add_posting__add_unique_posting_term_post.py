@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+from south.utils import datetime_utils as datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        # Adding model 'SearchTerm'
+        db.create_table(u'blog_searchterm', (
+            (u'id', self.gf('django.db.models.fields.AutoField')(primary_key=True)),
+            ('term', self.gf('django.db.models.fields.CharField')(unique=True, max_length=64)),
+        ))
+        db.send_create_signal(u'blog', ['SearchTerm'])
+
+        # Adding model 'Posting'
+        db.create_table(u'blog_posting', (
+            (u'id', self.gf('django.db.models.fields.AutoField')(primary_key=True)),
+            ('term', self.gf('django.db.models.fields.related.ForeignKey')(related_name='postings', to=orm['blog.SearchTerm'])),
+            ('post', self.gf('django.db.models.fields.related.ForeignKey')(related_name='+', to=orm['blog.Post'])),
+            ('weight', self.gf('django.db.models.fields.FloatField')()),
+        ))
+        db.send_create_signal(u'blog', ['Posting'])
+
+        # Adding unique constraint on 'Posting', fields ['term', 'post']
+        db.create_unique(u'blog_posting', ['term_id', 'post_id'])
+
+
+    def backwards(self, orm):
+        # Removing unique constraint on 'Posting', fields ['term', 'post']
+        db.delete_unique(u'blog_posting', ['term_id', 'post_id'])
+
+        # Deleting model 'SearchTerm'
+        db.delete_table(u'blog_searchterm')
+
+        # Deleting model 'Posting'
+        db.delete_table(u'blog_posting')
+
+
+    models = {
+        u'blog.post': {
+            'Meta': {'object_name': 'Post', 'index_together': "[('live', 'published_at', 'id'), ('live', 'modified_at')]"},
+            'author_id': ('django.db.models.fields.IntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'body_html': ('django.db.models.fields.TextField', [], {'blank': 'True'}),
+            'body_markdown': ('django.db.models.fields.TextField', [], {'blank': 'True'}),
+            'body_markdown_hash': ('django.db.models.fields.CharField', [], {'max_length': '40', 'blank': 'True'}),
+            'created_at': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'discussion_link': ('django.db.models.fields.URLField', [], {'max_length': '200', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'link': ('django.db.models.fields.URLField', [], {'max_length': '255', 'blank': 'True'}),
+            'link_text': ('django.db.models.fields.CharField', [], {'max_length': '255', 'blank': 'True'}),
+            'live': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'modified_at': ('django.db.models.fields.DateTimeField', [], {'auto_now': 'True', 'blank': 'True'}),
+            'post_type': ('django.db.models.fields.CharField', [], {'default': "'blog'", 'max_length': '15'}),
+            'published_at': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'slug': ('django.db.models.fields.SlugField', [], {'unique': 'True', 'max_length': '255'}),
+            'summary': ('django.db.models.fields.TextField', [], {}),
+            'title': ('django.db.models.fields.TextField', [], {})
+        },
+        u'blog.posting': {
+            'Meta': {'unique_together': "[('term', 'post')]", 'object_name': 'Posting'},
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'post': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "'+'", 'to': u"orm['blog.Post']"}),
+            'term': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "'postings'", 'to': u"orm['blog.SearchTerm']"}),
+            'weight': ('django.db.models.fields.FloatField', [], {})
+        },
+        u'blog.searchterm': {
+            'Meta': {'object_name': 'SearchTerm'},
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'term': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '64'})
+        }
+    }
+
+    complete_apps = ['blog']
\ No newline at end of file
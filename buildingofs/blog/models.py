@@ -1,11 +1,33 @@
+from django.conf import settings
+from django.core.urlresolvers import reverse
 from django.db import models
-import markdown
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
 
 from buildingofs.staff.models import Staff
 
+from .cache import content_deleted, content_saved
+from .publish import post_removed, post_saved
+from .rendering import defer, defer_render, markdown_hash, render_markdown
+from .search import index_post
+
+
+# large column that listings never show, they show the rendered body_html
+LISTING_DEFERRED_FIELDS = ('body_markdown',)
+# feed entries only carry the summary
+FEED_DEFERRED_FIELDS = ('body_markdown', 'body_html')
+
 
 class Post(models.Model):
 
+    class Meta:
+        # backs the keyset paged listing, see pagination.py
+        index_together = [
+            ('live', 'published_at', 'id'),
+            ('live', 'modified_at'),
+        ]
+
     TYPE_BLOG = 'blog'
     TYPE_LINK = 'link'
     TYPE_AD = 'ad'
@@ -31,6 +53,8 @@ class Post(models.Model):
 
     body_markdown = models.TextField(blank=True)
     body_html = models.TextField(blank=True)
+    # hash of the markdown body_html was rendered from
+    body_markdown_hash = models.CharField(max_length=40, blank=True, editable=False)
 
     link = models.URLField(max_length=255, blank=True)
     link_text = models.CharField(max_length=255, blank=True)
@@ -44,10 +68,13 @@ class Post(models.Model):
     @property
     def author(self):
         if not hasattr(self, '_author'):
-            try:
-                self._author = Staff.objects.get(pk=self.author_id)
-            except Staff.DoesNotExist:
-                self._author = None
+            self._author = None
+            # get() without an id would match every staff member
+            if self.author_id is not None:
+                try:
+                    self._author = Staff.objects.get(pk=self.author_id)
+                except Staff.DoesNotExist:
+                    pass
         return self._author
 
     @author.setter
@@ -55,6 +82,9 @@ class Post(models.Model):
         self._author = value
         self.authod_id = value.id
 
+    def get_absolute_url(self):
+        return reverse('view-post', kwargs={'slug': self.slug})
+
     def discussion_forum(self):
         if 'reddit.com' in self.discussion_link:
             return self.DISCUSSION_TYPE_REDDIT
@@ -66,8 +96,58 @@ class Post(models.Model):
 
     def save(self, *args, **kwargs):
 
+        if self.live and self.published_at is None:
+            # listings are ordered and paged on published_at
+            self.published_at = timezone.now()
+
+        deferred = False
         if self.body_markdown:
-            self.body_html = markdown.markdown(self.body_markdown)
+            digest = markdown_hash(self.body_markdown)
+            if digest != self.body_markdown_hash:
+                if settings.BLOG_DEFERRED_MARKDOWN and self.pk:
+                    deferred = True
+                else:
+                    self.body_html = render_markdown(self.body_markdown, digest)
+                    self.body_markdown_hash = digest
+
+        old_slug = None
+        if self.pk:
+            old_slug = Post.objects.filter(pk=self.pk).values_list('slug', flat=True).first()
+
+        result = super(Post, self).save(*args, **kwargs)
+        defer(content_saved, self.pk, self.modified_at, (old_slug, self.slug))
+        post_saved(self, old_slug)
+        index_post(self)
+
+        if deferred:
+            defer_render(self.pk, digest)
+
+        return result
+
+
+class SearchTerm(models.Model):
+    """ A word of the search index, see search.py """
+
+    term = models.CharField(max_length=64, unique=True)
+
+    def __unicode__(self):
+        return self.term
+
+
+class Posting(models.Model):
+    """ A term's occurrence in a post """
+
+    class Meta:
+        unique_together = [('term', 'post')]
+
+    term = models.ForeignKey(SearchTerm, related_name='postings')
+    post = models.ForeignKey(Post, related_name='+')
+    # the term's length normalised, field weighted frequency in the post
+    weight = models.FloatField()
+
 
-        return super(Post, self).save(*args, **kwargs)
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    defer(content_deleted, instance.pk, instance.slug)
+    post_removed(instance)
 
@@ -0,0 +1,86 @@
+"""
+Keyset (seek) pagination for post listings.
+
+Pages are ordered newest first on (published_at, id) and a page is
+addressed by a cursor naming the last post of the previous page, so
+fetching any page costs the same however deep into the archive it is.
+The (live, published_at, id) index on Post backs these queries.
+"""
+import calendar
+import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+# larger ids don't fit the databases' integers
+MAX_PK = 2 ** 63
+
+
+class Page(object):
+
+    def __init__(self, posts, cursor=None, next_cursor=None):
+        self.posts = posts
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.posts)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def encode_cursor(post):
+    """
+    Cursor for the position just after post
+
+        '1413720000123456.42'
+    """
+    published_at = post.published_at
+    micros = calendar.timegm(published_at.utctimetuple()) * 10 ** 6
+    micros += published_at.microsecond
+    return '{}.{}'.format(micros, post.pk)
+
+
+def decode_cursor(cursor):
+    """
+    Returns (published_at, id), raises ValueError for malformed cursors
+    """
+    micros, pk = cursor.split('.')
+    micros, pk = int(micros), int(pk)
+    if not 0 < pk < MAX_PK:
+        raise ValueError("Post id out of range: {}".format(pk))
+    try:
+        published_at = datetime.datetime(1970, 1, 1, tzinfo=timezone.utc)
+        published_at += datetime.timedelta(microseconds=micros)
+    except OverflowError:
+        raise ValueError("Date out of range: {}".format(micros))
+    return published_at, pk
+
+
+def get_page(queryset, cursor=None, page_size=None):
+    """
+    Get the page of queryset after cursor, or the first page
+
+    Raises ValueError for malformed cursors
+    """
+    page_size = page_size or settings.BLOG_PAGE_SIZE
+
+    queryset = queryset.order_by('-published_at', '-id')
+    if cursor:
+        published_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(published_at__lt=published_at) |
+            Q(published_at=published_at, id__lt=pk)
+        )
+
+    posts = list(queryset[:page_size + 1])
+
+    next_cursor = None
+    if len(posts) > page_size:
+        posts = posts[:page_size]
+        next_cursor = encode_cursor(posts[-1])
+
+    return Page(posts, cursor, next_cursor)
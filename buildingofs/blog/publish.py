@@ -0,0 +1,195 @@
+"""
+Static copies of blog pages for the front web server.
+
+With BLOG_PUBLISH_ROOT set, the homepage and every live post are written
+out as index.html files mirroring their URLs:
+
+    <BLOG_PUBLISH_ROOT>/index.html
+    <BLOG_PUBLISH_ROOT>/blog/<slug>/index.html
+
+so the web server can try them before handing the request to django.
+Only the first page of the homepage is published, and web servers match
+files on the path alone, so requests with a query string, such as the
+homepage's ?before= pages, must bypass the static copies. With nginx:
+
+    location / {
+        if ($args) {
+            proxy_pass http://django;
+        }
+        try_files $uri/index.html @django;
+    }
+
+Files are written to a temporary file and renamed into place, so readers
+never see a partial page. Saving or deleting a post queues an update of
+the files for the blog's worker thread, which waits for the change to be
+committed (see rendering.defer), and the publish_blog command rebuilds
+whatever is out of date.
+"""
+import calendar
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.urlresolvers import reverse
+from django.test.client import RequestFactory
+
+from .rendering import defer
+
+
+def enabled():
+    return bool(settings.BLOG_PUBLISH_ROOT)
+
+
+def _path(url):
+    return os.path.join(settings.BLOG_PUBLISH_ROOT, url.lstrip('/'), 'index.html')
+
+
+def write_atomic(path, content):
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.publish-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.chmod(tmp_path, 0644)
+        os.rename(tmp_path, path)
+    except:
+        os.unlink(tmp_path)
+        raise
+
+
+def render(view, url, **kwargs):
+    request = RequestFactory().get(url)
+    response = view(request, **kwargs)
+    if response.status_code != 200:
+        return None
+    return response.content
+
+
+def publish_homepage():
+    from buildingofs.views import HomepageView
+
+    url = reverse('home')
+    content = render(HomepageView.as_view(), url)
+    if content is not None:
+        write_atomic(_path(url), content)
+
+
+def publish_post(post):
+    from .views import PostView
+
+    url = post.get_absolute_url()
+    content = render(PostView.as_view(), url, slug=post.slug)
+    if content is not None:
+        write_atomic(_path(url), content)
+
+
+def unpublish(slug):
+    directory = os.path.dirname(_path(reverse('view-post', kwargs={'slug': slug})))
+    if os.path.isdir(directory):
+        shutil.rmtree(directory)
+
+
+def post_changed(post, old_slug=None):
+    """
+    Bring the published files up to date after a post was saved
+    """
+    if not enabled():
+        return
+
+    if old_slug and old_slug != post.slug:
+        unpublish(old_slug)
+
+    if post.live:
+        publish_post(post)
+    else:
+        unpublish(post.slug)
+
+    publish_homepage()
+
+
+def publish_saved(post_id, modified_at, old_slug=None):
+    """
+    Background job publishing a saved post, False until the database
+    shows the save
+    """
+    from .models import Post
+
+    try:
+        post = Post.objects.defer('body_markdown').get(pk=post_id)
+    except Post.DoesNotExist:
+        # a new post that isn't committed yet, or deleted meanwhile
+        return False
+
+    # the database may not keep microseconds
+    if post.modified_at < modified_at.replace(microsecond=0):
+        return False
+
+    post_changed(post, old_slug)
+    return True
+
+
+def publish_removed(post_id, slug):
+    """
+    Background job unpublishing a deleted post, False until the database
+    shows the delete
+    """
+    from .models import Post
+
+    if Post.objects.filter(pk=post_id).exists():
+        return False
+
+    unpublish(slug)
+    publish_homepage()
+    return True
+
+
+def post_saved(post, old_slug=None):
+    if enabled():
+        defer(publish_saved, post.pk, post.modified_at, old_slug)
+
+
+def post_removed(post):
+    if enabled():
+        defer(publish_removed, post.pk, post.slug)
+
+
+def _timestamp(dt):
+    return calendar.timegm(dt.utctimetuple()) + dt.microsecond / 1e6
+
+
+def publish_all(force=False):
+    """
+    Publish live posts whose files are missing or older than the post,
+    remove files of posts that are no longer live and republish the
+    homepage
+
+    Returns (published slugs, removed slugs)
+    """
+    from .models import Post
+
+    published, removed = [], []
+    live_slugs = set()
+
+    for post in Post.objects.filter(live=True).defer('body_markdown').iterator():
+        live_slugs.add(post.slug)
+        path = _path(post.get_absolute_url())
+        if not force and os.path.exists(path) and \
+                os.path.getmtime(path) >= _timestamp(post.modified_at):
+            continue
+        publish_post(post)
+        published.append(post.slug)
+
+    posts_dir = os.path.dirname(os.path.dirname(
+        _path(reverse('view-post', kwargs={'slug': 'x'}))))
+    if os.path.isdir(posts_dir):
+        for slug in os.listdir(posts_dir):
+            if slug not in live_slugs and os.path.isdir(os.path.join(posts_dir, slug)):
+                unpublish(slug)
+                removed.append(slug)
+
+    publish_homepage()
+    return published, removed
@@ -0,0 +1,143 @@
+"""
+Markdown rendering for post bodies.
+
+Rendered HTML is cached by a hash of the markdown, so posts with the same
+body share it and re-saving an unchanged body costs nothing. With
+BLOG_DEFERRED_MARKDOWN on, Post.save() leaves the previous HTML in place
+and a worker thread renders the new body and writes it back.
+
+Jobs are queued from inside save(), possibly before its transaction
+commits, so they check the database shows what was saved and are retried
+until it does.
+"""
+import hashlib
+import logging
+import threading
+import Queue
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.utils import timezone
+import markdown
+
+logger = logging.getLogger(__name__)
+
+# attempts of a job waiting for a transaction to commit, the delay in
+# seconds doubles after each one
+RETRIES = 8
+RETRY_DELAY = 0.1
+
+_queue = Queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def markdown_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def render_markdown(text, digest=None):
+    digest = digest or markdown_hash(text)
+    key = 'blog.markdown-{}'.format(digest)
+
+    html = cache.get(key)
+    if html is None:
+        html = markdown.markdown(text)
+        cache.set(key, html, settings.BLOG_CACHE_TIMEOUT)
+    return html
+
+
+def render_post_body(post_id, digest=None):
+    """
+    Render a saved post's body if it changed since it was last rendered
+
+    digest is the hash of the markdown that was saved. Returns False while
+    the database doesn't show that markdown yet, True once there's nothing
+    left to do.
+    """
+    from .cache import bump_content_version, cache_post
+    from .models import Post
+    from .publish import post_changed
+    from .search import index_post
+
+    try:
+        text, rendered_hash = Post.objects.filter(pk=post_id).values_list(
+            'body_markdown', 'body_markdown_hash').get()
+    except Post.DoesNotExist:
+        return True
+
+    current = markdown_hash(text)
+    if digest is not None and current != digest:
+        # not committed yet, or superseded by a later save with its own job
+        return False
+    if not text or current == rendered_hash:
+        return True
+
+    modified_at = timezone.now()
+    Post.objects.filter(pk=post_id).update(
+        body_html=render_markdown(text, current),
+        body_markdown_hash=current,
+        modified_at=modified_at,
+    )
+    bump_content_version(modified_at)
+    post = Post.objects.get(pk=post_id)
+    cache_post(post)
+    post_changed(post)
+    index_post(post)
+    return True
+
+
+def _run(func, args, attempt):
+    # the worker outlives requests, don't hold on to a dead connection
+    close_old_connections()
+    try:
+        done = func(*args)
+    except Exception:
+        logger.exception("Background job %s%r failed", func.__name__, args)
+        done = True
+    finally:
+        close_old_connections()
+
+    if done is False:
+        if attempt < RETRIES:
+            retry = threading.Timer(RETRY_DELAY * 2 ** attempt, _queue.put,
+                                    args=((func, args, attempt + 1),))
+            retry.daemon = True
+            retry.start()
+        else:
+            logger.warning("Gave up on background job %s%r", func.__name__, args)
+
+
+def _work():
+    while True:
+        func, args, attempt = _queue.get()
+        try:
+            _run(func, args, attempt)
+        finally:
+            _queue.task_done()
+
+
+def defer(func, *args):
+    """
+    Call func(*args) in the worker thread, func returns False to be
+    retried later
+    """
+    global _worker
+
+    with _worker_lock:
+        # a forked child starts its own
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_work, name='blog-worker')
+            _worker.daemon = True
+            _worker.start()
+
+    _queue.put((func, args, 0))
+
+
+def defer_render(post_id, digest):
+    """
+    Queue a post's body, saved with the markdown hashing to digest, for
+    rendering in the background
+    """
+    defer(render_post_body, post_id, digest)
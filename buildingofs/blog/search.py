@@ -0,0 +1,223 @@
+"""
+Full-text search over live posts.
+
+Posts are indexed into an inverted index in the database: a SearchTerm
+row per distinct word and a Posting per (term, post) with the term's
+weight in the post. Title words weigh more than summary words, which
+weigh more than body words, and weights are normalised by the length of
+the post so long posts don't win on length alone.
+
+Post.save() reindexes the post, writing only the postings that changed.
+Answering a query reads only the postings of its terms, through the term
+index, never the posts themselves. Matches are ranked by how many of the
+query's terms they contain, then by tf-idf.
+"""
+import hashlib
+import heapq
+import math
+import re
+import unicodedata
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.utils.html import strip_tags
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 10
+
+STOP_WORDS = frozenset("""
+a an and are as at be but by for from has have i in is it its of on or
+that the this to was we were will with you your
+""".split())
+
+FIELD_WEIGHTS = (
+    ('title', 3.0),
+    ('summary', 2.0),
+    ('body', 1.0),
+)
+
+# bound parameters per query, below sqlite's limit
+CHUNK_SIZE = 500
+
+
+def normalize(text):
+    """
+    Lower case text without accents
+    """
+    text = unicodedata.normalize('NFKD', unicode(text).lower())
+    return u''.join(char for char in text if not unicodedata.combining(char))
+
+
+def terms(text):
+    """
+    The indexed words of text, in order
+    """
+    return [word[:MAX_TERM_LENGTH] for word in WORD_RE.findall(normalize(text))
+            if word not in STOP_WORDS]
+
+
+def query_terms(query):
+    seen = []
+    for term in terms(query):
+        if term not in seen:
+            seen.append(term)
+    return seen[:MAX_QUERY_TERMS]
+
+
+def query_key(query):
+    return hashlib.md5(u' '.join(query_terms(query)).encode('utf-8')).hexdigest()
+
+
+def post_fields(post):
+    # with deferred rendering the html can lag behind, render_post_body
+    # reindexes once it has caught up
+    body = strip_tags(post.body_html) if post.body_html else post.body_markdown
+    return {
+        'title': post.title,
+        'summary': post.summary,
+        'body': body,
+    }
+
+
+def term_weights(post):
+    """
+    {term: weight} of the terms of a post
+    """
+    fields = post_fields(post)
+    counts = defaultdict(float)
+    for name, weight in FIELD_WEIGHTS:
+        for term in terms(fields[name] or ''):
+            counts[term] += weight
+
+    if not counts:
+        return {}
+    length = math.sqrt(sum(counts.itervalues()))
+    return dict((term, count / length) for term, count in counts.iteritems())
+
+
+def _chunks(items):
+    items = list(items)
+    for start in xrange(0, len(items), CHUNK_SIZE):
+        yield items[start:start + CHUNK_SIZE]
+
+
+def term_ids(words):
+    """
+    {term: id} for words, creating the terms that don't exist yet
+    """
+    from .models import SearchTerm
+
+    ids = {}
+    for chunk in _chunks(words):
+        ids.update(SearchTerm.objects.filter(term__in=chunk).values_list('term', 'id'))
+
+    missing = [word for word in words if word not in ids]
+    if missing:
+        try:
+            with transaction.atomic():
+                SearchTerm.objects.bulk_create(
+                    [SearchTerm(term=word) for word in missing])
+        except IntegrityError:
+            # another post created some of them meanwhile
+            for word in missing:
+                SearchTerm.objects.get_or_create(term=word)
+        for chunk in _chunks(missing):
+            ids.update(SearchTerm.objects.filter(term__in=chunk).values_list('term', 'id'))
+    return ids
+
+
+def index_post(post):
+    """
+    Bring the postings of a saved post up to date, posts that aren't
+    live have none
+
+    Returns the number of postings written or deleted
+    """
+    from .models import Posting
+
+    weights = term_weights(post) if post.live else {}
+
+    with transaction.atomic():
+        existing = dict(
+            (term, (posting_id, weight)) for posting_id, term, weight in
+            Posting.objects.filter(post=post).values_list('id', 'term__term', 'weight'))
+
+        stale = [posting_id for term, (posting_id, weight) in existing.iteritems()
+                 if term not in weights]
+        for chunk in _chunks(stale):
+            Posting.objects.filter(id__in=chunk).delete()
+
+        changes = len(stale)
+        for term, weight in weights.iteritems():
+            if term in existing:
+                posting_id, old_weight = existing[term]
+                if abs(old_weight - weight) > 1e-9:
+                    Posting.objects.filter(id=posting_id).update(weight=weight)
+                    changes += 1
+
+        new = [term for term in weights if term not in existing]
+        if new:
+            ids = term_ids(new)
+            Posting.objects.bulk_create([
+                Posting(term_id=ids[term], post_id=post.pk, weight=weights[term])
+                for term in new
+            ])
+            changes += len(new)
+
+    return changes
+
+
+def reindex():
+    """
+    Bring the postings of every post up to date and drop terms no post
+    uses
+
+    Returns the number of posts indexed
+    """
+    from .models import Post, SearchTerm
+
+    count = 0
+    for post in Post.objects.iterator():
+        index_post(post)
+        count += 1
+    SearchTerm.objects.filter(postings__isnull=True).delete()
+    return count
+
+
+def search(query, limit=20):
+    """
+    The live posts best matching query, best first
+    """
+    from .models import LISTING_DEFERRED_FIELDS, Post, Posting, SearchTerm
+
+    words = query_terms(query)
+    if not words:
+        return []
+
+    ids = list(SearchTerm.objects.filter(term__in=words).values_list('id', flat=True))
+    if not ids:
+        return []
+
+    postings = list(Posting.objects.filter(term__in=ids, post__live=True)
+                    .values_list('term_id', 'post_id', 'weight'))
+
+    document_counts = defaultdict(int)
+    for term_id, post_id, weight in postings:
+        document_counts[term_id] += 1
+
+    total = Post.objects.filter(live=True).count()
+    idf = dict((term_id, math.log(1.0 + float(total) / count))
+               for term_id, count in document_counts.iteritems())
+
+    scores = defaultdict(float)
+    matched = defaultdict(int)
+    for term_id, post_id, weight in postings:
+        scores[post_id] += weight * idf[term_id]
+        matched[post_id] += 1
+
+    best = heapq.nlargest(limit, scores,
+                          key=lambda post_id: (matched[post_id], scores[post_id], post_id))
+    posts = Post.objects.defer(*LISTING_DEFERRED_FIELDS).in_bulk(best)
+    return [posts[post_id] for post_id in best if post_id in posts]
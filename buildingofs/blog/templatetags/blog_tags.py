@@ -1,13 +1,49 @@
-from django.template import Library, loader, Context
+from django.conf import settings
+from django.template import Context, Library, loader, TemplateDoesNotExist
+
+from buildingofs.blog.cache import fragment_key, get_or_render
 
 register = Library()
 
+# post type -> compiled snippet template, None for types without one
+_snippet_templates = {}
+
+
+def get_snippet_template(post_type):
+    """
+    Load the snippet template for a post type once per process. Reloaded
+    every time when DEBUG is on so template edits show up.
+    """
+    if not settings.DEBUG and post_type in _snippet_templates:
+        return _snippet_templates[post_type]
+
+    try:
+        template = loader.get_template("blog/snippets/{}.html".format(post_type))
+    except TemplateDoesNotExist:
+        template = None
+
+    _snippet_templates[post_type] = template
+    return template
+
 
 @register.simple_tag(takes_context=True)
 def render_post(context, post):
-    template_name = "blog/snippets/{}.html".format(post.post_type)
-    context = {
-        "post": post,
-    }
-    template = loader.get_template(template_name)
-    return template.render(Context(context))
+    """
+    A post's snippet, cached by fragment_key(), so it's rendered with
+    nothing but the post. Anything else of the page would be cached along
+    and shown on other pages
+    """
+    template = get_snippet_template(post.post_type)
+    if template is None:
+        return ''
+
+    def render():
+        return template.render(Context(
+            {'post': post},
+            autoescape=context.autoescape,
+            current_app=context.current_app,
+            use_l10n=context.use_l10n,
+            use_tz=context.use_tz,
+        ))
+
+    return get_or_render(fragment_key(post), render)
@@ -1,3 +1,422 @@
-from django.test import TestCase
+import datetime
+import os
+import shutil
+import tempfile
 
-# Create your tests here.
+from django.db import IntegrityError, transaction
+from django.http import Http404
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.template import Context, Template
+from django.test import SimpleTestCase, TestCase
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from . import cache as blog_cache, feeds, models, publish, rendering
+from .models import Post
+from .pagination import decode_cursor, encode_cursor
+from .rendering import markdown_hash, render_post_body
+from .templatetags import blog_tags
+from .views import listing_response
+
+
+def create_post(**kwargs):
+    fields = {
+        'slug': 'post',
+        'title': 'Post',
+        'summary': 'Summary',
+        'body_markdown': 'Some *body* about django 2',
+        'live': True,
+    }
+    fields.update(kwargs)
+    return Post.objects.create(**fields)
+
+
+class JobsMixin(object):
+    """
+    Collects the jobs saving and deleting posts queue for the blog's
+    worker, run_jobs() runs them
+    """
+
+    def setUp(self):
+        super(JobsMixin, self).setUp()
+        self.jobs = []
+        self._defers = models.defer, publish.defer
+        models.defer = publish.defer = lambda *args: self.jobs.append(args)
+
+    def tearDown(self):
+        models.defer, publish.defer = self._defers
+        super(JobsMixin, self).tearDown()
+
+    def run_jobs(self):
+        jobs, self.jobs = self.jobs, []
+        return [job[0](*job[1:]) for job in jobs]
+
+
+@override_settings(BLOG_DEFERRED_MARKDOWN=True)
+class DeferredRenderTest(JobsMixin, TestCase):
+
+    def setUp(self):
+        super(DeferredRenderTest, self).setUp()
+        self.renders = []
+        self._defer_render = models.defer_render
+        models.defer_render = lambda *args: self.renders.append(args)
+
+    def tearDown(self):
+        models.defer_render = self._defer_render
+        super(DeferredRenderTest, self).tearDown()
+
+    def test_edit_renders_the_saved_body(self):
+        post = create_post()
+        post.body_markdown = 'Another *fresh* body'
+        with transaction.atomic():
+            post.save()
+
+        self.assertEqual(self.renders, [(post.pk, markdown_hash('Another *fresh* body'))])
+        # still the previous html until the job runs
+        self.assertIn('<em>body</em>', Post.objects.get(pk=post.pk).body_html)
+
+        self.assertTrue(render_post_body(*self.renders[0]))
+        post = Post.objects.get(pk=post.pk)
+        self.assertIn('<em>fresh</em>', post.body_html)
+        self.assertEqual(post.body_markdown_hash, markdown_hash('Another *fresh* body'))
+
+    def test_waits_until_the_saved_body_is_visible(self):
+        post = create_post()
+        # as seen by the worker before the saving transaction commits
+        self.assertFalse(render_post_body(post.pk, markdown_hash('Another *fresh* body')))
+        self.assertIn('<em>body</em>', Post.objects.get(pk=post.pk).body_html)
+
+    def test_unchanged_body_is_done(self):
+        post = create_post()
+        self.assertTrue(render_post_body(post.pk, post.body_markdown_hash))
+
+
+class WorkerTest(SimpleTestCase):
+
+    def setUp(self):
+        self._queue, self._delay = rendering._queue, rendering.RETRY_DELAY
+        rendering._queue = rendering.Queue.Queue()
+        rendering.RETRY_DELAY = 0.01
+
+    def tearDown(self):
+        rendering._queue, rendering.RETRY_DELAY = self._queue, self._delay
+
+    def test_job_not_done_is_retried(self):
+        rendering._run(lambda post_id: False, (1,), 0)
+        func, args, attempt = rendering._queue.get(timeout=1)
+        self.assertEqual((args, attempt), ((1,), 1))
+
+    def test_gives_up_after_retries(self):
+        rendering._run(lambda post_id: False, (1,), rendering.RETRIES)
+        self.assertRaises(rendering.Queue.Empty, rendering._queue.get, timeout=0.1)
+
+    def test_failing_job_is_not_retried(self):
+        def fail(post_id):
+            raise ValueError
+        rendering._run(fail, (1,), 0)
+        self.assertRaises(rendering.Queue.Empty, rendering._queue.get, timeout=0.1)
+
+
+class CursorTest(SimpleTestCase):
+
+    def test_round_trip(self):
+        published_at = datetime.datetime(2014, 10, 19, 12, 0, 0, 123456, tzinfo=timezone.utc)
+        post = Post(id=42, published_at=published_at)
+        self.assertEqual(decode_cursor(encode_cursor(post)), (published_at, 42))
+
+    def test_malformed(self):
+        for cursor in ('', 'abc', '1', '1.2.3', 'a.1', '1.a', '1.0', '1.-1'):
+            self.assertRaises(ValueError, decode_cursor, cursor)
+
+    def test_out_of_range(self):
+        for cursor in ('99999999999999999999999.1', '-99999999999999999999999.1',
+                       '1413720000123456.99999999999999999999999'):
+            self.assertRaises(ValueError, decode_cursor, cursor)
+
+    def test_listing_404s_on_huge_cursor(self):
+        request = RequestFactory().get('/', {'before': '99999999999999999999999.1'})
+        self.assertRaises(Http404, listing_response, request, 'homepage.html', 'homepage')
+
+
+class PublishTest(JobsMixin, TestCase):
+
+    def setUp(self):
+        super(PublishTest, self).setUp()
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+        super(PublishTest, self).tearDown()
+
+    def path(self, post):
+        return os.path.join(self.root, 'blog', post.slug, 'index.html')
+
+    def test_published_by_the_worker_after_save(self):
+        with self.settings(BLOG_PUBLISH_ROOT=self.root):
+            with transaction.atomic():
+                post = create_post()
+                # nothing is published from inside the transaction
+                self.assertFalse(os.path.exists(self.path(post)))
+
+            self.assertEqual(self.run_jobs(), [True, True])
+            self.assertTrue(os.path.exists(self.path(post)))
+
+            post.delete()
+            self.assertEqual(self.run_jobs(), [True, True])
+            self.assertFalse(os.path.exists(self.path(post)))
+
+    def test_waits_for_the_save(self):
+        post = create_post()
+        later = post.modified_at + datetime.timedelta(seconds=5)
+        with self.settings(BLOG_PUBLISH_ROOT=self.root):
+            # as seen by the worker before the saving transaction commits
+            self.assertFalse(publish.publish_saved(post.pk, later))
+            self.assertFalse(publish.publish_saved(post.pk + 1, post.modified_at))
+            self.assertFalse(publish.publish_removed(post.pk, post.slug))
+        self.assertFalse(os.path.exists(self.path(post)))
+
+
+class SearchViewTest(JobsMixin, TestCase):
+
+    def setUp(self):
+        super(SearchViewTest, self).setUp()
+        cache.clear()
+        create_post(title='Python tips')
+
+    def get(self, query):
+        return self.client.get(reverse('post-search'), {'q': query}).content
+
+    def test_normalised_query_shown(self):
+        self.assertIn('value="python"', self.get('Python!!'))
+        content = self.get('python')
+        self.assertIn('value="python"', content)
+        self.assertNotIn('Python!!', content)
+        self.assertIn('Python tips', content)
+
+    def test_no_searchable_terms(self):
+        self.assertNotIn('Nothing to search for', self.get(''))
+        content = self.get('the')
+        self.assertIn('Nothing to search for', content)
+        self.assertNotIn('Python tips', content)
+        self.assertNotIn('Nothing to search for', self.get(''))
+
+
+class TemplateVersionTest(TestCase):
+
+    def setUp(self):
+        self.template_version = blog_cache.TEMPLATE_VERSION
+
+    def tearDown(self):
+        blog_cache.TEMPLATE_VERSION = self.template_version
+
+    def test_template_deploys_change_page_keys_and_etags(self):
+        key = blog_cache.versioned_key('homepage', '')
+        etag = blog_cache.content_etag(None)
+        blog_cache.TEMPLATE_VERSION += 1
+        self.assertNotEqual(blog_cache.versioned_key('homepage', ''), key)
+        self.assertNotEqual(blog_cache.content_etag(None), etag)
+
+
+class ContentVersionTest(JobsMixin, TestCase):
+
+    def setUp(self):
+        super(ContentVersionTest, self).setUp()
+        cache.clear()
+
+    def version(self):
+        return blog_cache.get_content_state()['version']
+
+    def test_bumped_once_the_save_is_committed(self):
+        version = self.version()
+        with transaction.atomic():
+            post = create_post()
+        # not from inside the transaction
+        self.assertEqual(self.version(), version)
+        self.run_jobs()
+        self.assertNotEqual(self.version(), version)
+
+        version = self.version()
+        post.delete()
+        self.assertEqual(self.version(), version)
+        self.run_jobs()
+        self.assertNotEqual(self.version(), version)
+
+    def test_waits_for_the_commit(self):
+        post = create_post()
+        self.run_jobs()
+        version = self.version()
+        # as seen by the worker before the transaction commits
+        later = post.modified_at + datetime.timedelta(seconds=5)
+        self.assertFalse(blog_cache.content_saved(post.pk, later))
+        self.assertFalse(blog_cache.content_saved(post.pk + 1, post.modified_at))
+        self.assertFalse(blog_cache.content_deleted(post.pk, post.slug))
+        self.assertEqual(self.version(), version)
+
+    def test_listing_rebuilt_after_save(self):
+        create_post(title='First post')
+        self.run_jobs()
+        self.assertIn('First post', self.client.get('/').content)
+        create_post(slug='second', title='Second post')
+        self.run_jobs()
+        self.assertIn('Second post', self.client.get('/').content)
+
+    def test_homepage_cached_until_a_change(self):
+        post = create_post(title='First post')
+        self.run_jobs()
+        self.assertIn('First post', self.client.get('/').content)
+
+        # not through save(), nothing is bumped
+        Post.objects.filter(pk=post.pk).update(title='Quietly renamed')
+        self.assertIn('First post', self.client.get('/').content)
+
+        post = Post.objects.get(pk=post.pk)
+        post.save()
+        self.run_jobs()
+        self.assertIn('Quietly renamed', self.client.get('/').content)
+
+    def test_conditional_get(self):
+        post = create_post()
+        self.run_jobs()
+        etag = self.client.get('/')['ETag']
+        self.assertEqual(self.client.get('/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        post.save()
+        self.run_jobs()
+        response = self.client.get('/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_fragment_key(self):
+        post = Post(slug='post', title='Post')
+        self.assertIsNone(blog_cache.fragment_key(post))
+        post.save()
+        key = blog_cache.fragment_key(post)
+        post.modified_at += datetime.timedelta(seconds=1)
+        self.assertNotEqual(blog_cache.fragment_key(post), key)
+
+    def test_slug_lookups_follow_committed_saves(self):
+        post = create_post()
+        self.run_jobs()
+        self.assertEqual(blog_cache.get_post_by_slug('post').title, 'Post')
+
+        try:
+            with transaction.atomic():
+                post.title = 'Rolled back'
+                post.slug = 'renamed'
+                post.save()
+                raise IntegrityError
+        except IntegrityError:
+            pass
+        self.assertEqual(blog_cache.get_post_by_slug('post').title, 'Post')
+        self.assertIsNone(blog_cache.get_post_by_slug('renamed'))
+
+        post = Post.objects.get(pk=post.pk)
+        post.slug = 'renamed'
+        post.save()
+        self.run_jobs()
+        self.assertIsNone(blog_cache.get_post_by_slug('post'))
+        self.assertEqual(blog_cache.get_post_by_slug('renamed').pk, post.pk)
+
+        post.delete()
+        self.run_jobs()
+        self.assertIsNone(blog_cache.get_post_by_slug('renamed'))
+
+
+class RenderPostTest(JobsMixin, TestCase):
+
+    def setUp(self):
+        super(RenderPostTest, self).setUp()
+        cache.clear()
+        self._snippet_templates = blog_tags._snippet_templates.copy()
+        blog_tags._snippet_templates['blog'] = Template('{{ user }}: {{ post.title }}')
+
+    def tearDown(self):
+        blog_tags._snippet_templates.clear()
+        blog_tags._snippet_templates.update(self._snippet_templates)
+        super(RenderPostTest, self).tearDown()
+
+    def test_snippet_sees_only_the_post(self):
+        post = create_post(title='Title')
+        with self.settings(DEBUG=False):
+            first = blog_tags.render_post(Context({'user': 'ann'}), post)
+            second = blog_tags.render_post(Context({'user': 'bob'}), post)
+        self.assertEqual(first, ': Title')
+        self.assertEqual(second, first)
+
+
+class FeedTest(JobsMixin, TestCase):
+
+    def setUp(self):
+        super(FeedTest, self).setUp()
+        cache.clear()
+        create_post()
+        self.run_jobs()
+
+    def get(self, secure):
+        extra = {'wsgi.url_scheme': 'https', 'SERVER_PORT': '443'} if secure else {}
+        response = self.client.get(reverse('post-feed'), **extra)
+        return ''.join(response.streaming_content) if response.streaming else response.content
+
+    def test_unchanged_entries_reused(self):
+        rendered = []
+        render_item = feeds.AtomFeed.render_item
+
+        def record_render(feed, item):
+            rendered.append(item['title'])
+            return render_item(feed, item)
+        feeds.AtomFeed.render_item = record_render
+        # inherited, dropping the override restores it
+        self.addCleanup(delattr, feeds.AtomFeed, 'render_item')
+
+        first = self.get(False)
+        self.assertEqual(rendered, ['Post'])
+        self.assertEqual(self.get(False), first)
+        self.assertEqual(rendered, ['Post'])
+
+        create_post(slug='second', title='Second')
+        self.run_jobs()
+        self.assertIn('Second', self.get(False))
+        self.assertEqual(rendered, ['Post', 'Second'])
+
+    def test_links_follow_the_scheme(self):
+        self.assertIn('http://testserver/blog/post/', self.get(False))
+        self.assertIn('https://testserver/blog/post/', self.get(True))
+        self.assertNotIn('https://', self.get(False))
+
+
+class PostViewTest(JobsMixin, TestCase):
+
+    def setUp(self):
+        super(PostViewTest, self).setUp()
+        cache.clear()
+        self.post = create_post(title='Title')
+        self.run_jobs()
+        self.url = reverse('view-post', args=['post'])
+
+    def test_served_from_the_cache(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertIn('Title', response.content)
+
+        Post.objects.filter(pk=self.post.pk).update(title='Renamed')
+        self.assertIn('Title', self.client.get(self.url).content)
+        post = Post.objects.get(pk=self.post.pk)
+        post.save()
+        self.run_jobs()
+        self.assertIn('Renamed', self.client.get(self.url).content)
+
+    def test_missing_slugs_cached(self):
+        self.assertEqual(self.client.get('/blog/nothing/').status_code, 404)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/blog/nothing/').status_code, 404)
+
+        create_post(slug='nothing')
+        self.run_jobs()
+        self.assertEqual(self.client.get('/blog/nothing/').status_code, 200)
+
+    def test_conditional_get(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
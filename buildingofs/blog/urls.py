@@ -1,7 +1,11 @@
 from django.conf.urls import patterns, include, url
 
-from . import views
+from . import feeds, views
 
 urlpatterns = patterns('',
+    url(r'^page/$', views.PostPageView.as_view(), name='post-page'),
+    url(r'^feed/$', feeds.PostFeedView.as_view(), name='post-feed'),
+    url(r'^search/$', views.SearchView.as_view(), name='post-search'),
+    url(r'^feed/rss/$', feeds.PostRssFeedView.as_view(), name='post-rss-feed'),
     url(r'^(?P<slug>[\w\.-]+)/$', views.PostView.as_view(), name='view-post'),
 )
@@ -1,20 +1,100 @@
-from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.template.response import TemplateResponse
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from django.views.generic import View
 
 from buildingofs.utils.views import PermissionsMixin
 
-from .models import Post
+from .cache import (content_etag, content_last_modified, get_or_render,
+                    get_post_by_slug, post_etag, post_last_modified,
+                    post_page_key, versioned_key)
+from .models import Post, LISTING_DEFERRED_FIELDS
+from .pagination import decode_cursor, get_page
+from .search import query_key, query_terms, search
+
+
+def listing_response(request, template_name, cache_name):
+    """
+    Render a page of live posts, cached on the blog content version
+
+    The page is picked with ?before=<cursor>, see pagination.py
+    """
+    cursor = request.GET.get('before') or None
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError:
+            raise Http404
+
+    def render():
+        posts = Post.objects.filter(live=True).defer(*LISTING_DEFERRED_FIELDS)
+        page = get_page(posts, cursor)
+        context = {
+            "page": page,
+        }
+        return TemplateResponse(request, template_name, context).render().content
+
+    content = get_or_render(versioned_key(cache_name, cursor or ''), render)
+
+    response = HttpResponse(content)
+    patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+    return response
 
 
 class PostView(View):
 
+    @method_decorator(condition(etag_func=post_etag,
+                                last_modified_func=post_last_modified))
     def get(self, request, slug):
 
-        post = get_object_or_404(Post, slug=slug)
+        post = get_post_by_slug(slug)
+        if post is None:
+            raise Http404
 
-        context = {
-            "post": post,
-        }
+        def render():
+            context = {
+                "post": post,
+            }
+            return TemplateResponse(request, 'blog/post.html', context).render().content
+
+        response = HttpResponse(get_or_render(post_page_key(post), render))
+        patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+        return response
+
+
+class PostPageView(View):
+    """ Just the posts of a listing page, for infinite scrolling """
+
+    @method_decorator(condition(etag_func=content_etag,
+                                last_modified_func=content_last_modified))
+    def get(self, request):
+        return listing_response(request, 'blog/snippets/page.html', 'post-page')
+
+
+class SearchView(View):
+    """ Live posts matching ?q=, cached on the blog content version """
+
+    def get(self, request):
+        raw_query = request.GET.get('q', '').strip()
+        # the page shows the query as searched, so queries differing only
+        # in case, punctuation or stop words share it
+        query = u' '.join(query_terms(raw_query))
+        searched = bool(raw_query)
+
+        def render():
+            context = {
+                "query": query,
+                "searched": searched,
+                "posts": search(query, settings.BLOG_SEARCH_RESULTS),
+            }
+            return TemplateResponse(request, 'blog/search.html', context).render().content
+
+        key = versioned_key('search', query_key(query), int(searched))
+        content = get_or_render(key, render)
 
-        return TemplateResponse(request, 'blog/post.html', context)
+        response = HttpResponse(content)
+        patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+        return response
@@ -0,0 +1,13 @@
+from django.core.urlresolvers import reverse
+
+from buildingofs.utils import warmup
+
+from .publish import render
+
+
+@warmup.task('blog.homepage')
+def homepage():
+    """ Renders the first listing page and the fragments of its posts """
+    from buildingofs.views import HomepageView
+
+    render(HomepageView.as_view(), reverse('home'))
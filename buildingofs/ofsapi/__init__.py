@@ -1,8 +1,32 @@
+"""
+RPC access to the platform.
+
+``rpc`` is created on first use, so importing managers and running
+management commands doesn't need the platform. Calls share a pool of
+AMQP connections per process instead of connecting for every call. Forked
+workers must not share the parent's connections, the pool is dropped when
+the process id changes; call ``post_fork()`` from the server's post fork
+hook (e.g. gunicorn's ``post_fork``) to connect before taking requests,
+or utils.warmup.boot() to build its in-process state as well.
+"""
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
 from nameko.legacy.proxy import RPCProxy
 from nameko.exceptions import RemoteError
 from nameko.legacy.context import Context
 
 from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+logger = logging.getLogger(__name__)
+
+# uri -> kombu connection pool, for the process in _pools_pid
+_pools = {}
+_pools_pid = None
+_pools_lock = threading.Lock()
 
 
 def context_factory():
@@ -12,11 +36,93 @@ def context_factory():
     )
     return ctx
 
-rpc = RPCProxy(uri=settings.NAMEKO_URL, timeout=settings.NAMEKO_TIMEOUT,
-               context_factory=context_factory)
+
+def get_pool(uri):
+    """
+    The process' connection pool for uri
+    """
+    global _pools_pid
+    pid = os.getpid()
+    pool = _pools.get(uri) if _pools_pid == pid else None
+    if pool is None:
+        from kombu import BrokerConnection
+
+        with _pools_lock:
+            if _pools_pid != pid:
+                # forked, the parent's sockets aren't ours to use or close
+                _pools.clear()
+                _pools_pid = pid
+            pool = _pools.get(uri)
+            if pool is None:
+                connection = BrokerConnection(
+                    uri, transport_options={'confirm_publish': True})
+                pool = _pools[uri] = connection.Pool(
+                    limit=settings.NAMEKO_POOL_LIMIT)
+    return pool
+
+
+@contextmanager
+def pooled_connection(uri):
+    """
+    A connection from uri's pool, replaced rather than reused when it
+    fails
+    """
+    pool = get_pool(uri)
+    connection = pool.acquire(block=True)
+    try:
+        yield connection
+    except connection.connection_errors + connection.channel_errors:
+        pool.replace(connection)
+        raise
+    except:
+        connection.release()
+        raise
+    else:
+        connection.release()
+
+
+class PooledRPCProxy(RPCProxy):
+    """
+    RPCProxy using pooled connections
+    """
+
+    def create_connection(self):
+        return pooled_connection(self.uri)
+
+
+def _fake_proxy():
+    config = getattr(settings, 'NAMEKO_FAKE_PLATFORM', None)
+    if config is None:
+        return None
+
+    from .fake import FakeRPCProxy, build_platform
+    return FakeRPCProxy(build_platform(config))
+
+
+def _proxy():
+    return _fake_proxy() or PooledRPCProxy(uri=settings.NAMEKO_URL,
+                                           timeout=settings.NAMEKO_TIMEOUT,
+                                           context_factory=context_factory)
+
+rpc = SimpleLazyObject(_proxy)
+
+
+def install(proxy):
+    """
+    Replace the shared proxy, e.g. with a fake.FakeRPCProxy
+
+    Returns the previous proxy so it can be restored
+    """
+    global rpc
+    previous, rpc = rpc, proxy
+    return previous
 
 
 def rpc_factory(user=None):
+    if not isinstance(rpc, RPCProxy):
+        # a fake or recording proxy has been installed, context is unused
+        return rpc
+
     def context_factory():
         user_id = None
         if user and not user.is_anonymous():
@@ -28,5 +134,62 @@ def rpc_factory(user=None):
         )
 
         return ctx
-    return RPCProxy(uri=settings.NAMEKO_URL, timeout=settings.NAMEKO_TIMEOUT,
-               context_factory=context_factory)
+    return PooledRPCProxy(uri=settings.NAMEKO_URL, timeout=settings.NAMEKO_TIMEOUT,
+                          context_factory=context_factory)
+
+
+def warm_up(count=None):
+    """
+    Open count pooled connections to the platform in parallel
+
+    Returns the number connected, failures are logged so a worker still
+    starts when the platform is down.
+    """
+    if not isinstance(rpc, RPCProxy):
+        return 0
+    if count is None:
+        count = settings.NAMEKO_WARM_CONNECTIONS
+
+    pool = get_pool(settings.NAMEKO_URL)
+    connections = []
+    # taken before connecting so each thread connects a different one
+    for _ in xrange(min(count, settings.NAMEKO_POOL_LIMIT)):
+        connections.append(pool.acquire(block=True))
+
+    connected = []
+
+    def connect(connection):
+        try:
+            connection.ensure_connection(max_retries=1)
+        except Exception:
+            logger.exception("Connecting to the platform failed")
+        else:
+            connected.append(connection)
+
+    threads = [threading.Thread(target=connect, args=(connection,))
+               for connection in connections]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for connection in connections:
+        connection.release()
+    return len(connected)
+
+
+def post_fork():
+    """
+    Prepare a freshly forked worker: drop the connections inherited from
+    the parent and connect new ones
+
+        # gunicorn.conf.py
+        def post_fork(server, worker):
+            from buildingofs.ofsapi import post_fork
+            post_fork()
+    """
+    global _pools_pid
+    with _pools_lock:
+        _pools.clear()
+        _pools_pid = os.getpid()
+    return warm_up()
@@ -0,0 +1,104 @@
+"""
+Platform events.
+
+Apps register handlers for events the platform's nameko services
+dispatch, in an ``events`` module of the app:
+
+    from buildingofs.ofsapi import events
+
+    @events.handler('staff', 'staff_member_updated')
+    def staff_member_updated(data):
+        ...
+
+``listen()`` (the platform_events command) consumes the events from
+AMQP and hands them to the handlers. ``dispatch()`` calls them directly,
+standing in for the platform when there's no AMQP.
+"""
+import logging
+import socket
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.importlib import import_module
+from django.utils.module_loading import module_has_submodule
+
+logger = logging.getLogger(__name__)
+
+# (service, event type) -> [handler]
+handlers = defaultdict(list)
+
+QUEUE_NAME = 'evt-{service}-{event_type}--buildingofs'
+
+
+def handler(service, event_type):
+    """
+    Decorator registering a function to be called with the data of
+    service's event_type events
+    """
+    def register(func):
+        handlers[(service, event_type)].append(func)
+        return func
+    return register
+
+
+def dispatch(service, event_type, data):
+    """
+    Call the handlers of an event, errors are logged and don't stop the
+    other handlers
+    """
+    for func in handlers.get((service, event_type), ()):
+        try:
+            func(data)
+        except Exception:
+            logger.exception("Handling %s.%s event failed", service, event_type)
+
+
+def autodiscover():
+    """
+    Import the events module of every installed app to register its
+    handlers
+    """
+    for app in settings.INSTALLED_APPS:
+        if module_has_submodule(import_module(app), 'events'):
+            import_module('{}.events'.format(app))
+
+
+def queues():
+    from kombu import Queue
+    from nameko.events import get_event_exchange
+
+    return [
+        Queue(QUEUE_NAME.format(service=service, event_type=event_type),
+              exchange=get_event_exchange(service),
+              routing_key=event_type,
+              durable=False,
+              auto_delete=True)
+        for service, event_type in sorted(handlers)
+    ]
+
+
+def on_message(body, message):
+    info = message.delivery_info
+    service = info['exchange'].rsplit('.events', 1)[0]
+    try:
+        dispatch(service, info['routing_key'], body)
+    finally:
+        message.ack()
+
+
+def listen(uri=None, timeout=1):
+    """
+    Consume the registered events from AMQP until interrupted
+
+    The queues are shared, so events are handled once however many
+    listeners run.
+    """
+    from kombu import Connection, Consumer
+
+    with Connection(uri or settings.NAMEKO_URL) as connection:
+        with Consumer(connection, queues(), callbacks=[on_message]):
+            while True:
+                try:
+                    connection.drain_events(timeout=timeout)
+                except socket.timeout:
+                    pass
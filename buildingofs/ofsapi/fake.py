@@ -0,0 +1,333 @@
+"""
+A local stand-in for the nameko platform.
+
+Serves recorded responses or synthetic datasets through the same
+``rpc.topic.method(**kwargs)`` interface as ``RPCProxy`` so managers,
+caches and views can be exercised without AMQP. Enable it with the
+``NAMEKO_FAKE_PLATFORM`` setting or swap it in at runtime with
+``buildingofs.ofsapi.install``.
+
+    NAMEKO_FAKE_PLATFORM = {
+        'latency': 0.005,           # seconds added to every call
+        'jitter': 0.002,            # random extra latency, up to this much
+        'latency_per_row': 0.00001, # seconds per returned row
+        'datasets': {
+            'staff': 1000,          # synthetic rows, or a path to a JSON list
+        },
+        'recordings': 'rpc-recording.json',
+    }
+"""
+import copy
+import json
+import random
+import threading
+import time
+
+from nameko.exceptions import RemoteError
+
+from buildingofs.utils.query import run_query, paginate
+
+
+def _recording_key(topic, method, kwargs):
+    return json.dumps([topic, method, kwargs], sort_keys=True, default=str)
+
+
+#==============================================================================
+# Datasets
+#==============================================================================
+
+
+class Dataset(object):
+    """
+    A table of raw rows queried with the platform's query params
+    """
+
+    def __init__(self, rows, pk='id'):
+        self.pk = pk
+        self.rows = list(rows)
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        with open(path) as f:
+            return cls(json.load(f), **kwargs)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def query(self, params=None, **kwargs):
+        """
+        Handles both the legacy ``method(params={...})`` form and the
+        flattened ``method(**params)`` form used by RPCManager.rpc_call
+        """
+        params = dict(params or {}, **kwargs)
+
+        results = run_query(
+            self.rows,
+            filters=params.get('filters'),
+            sort_by=params.get('sort_by'),
+            sort_desc=params.get('sort_desc', False),
+        )
+        fields = params.get('fields')
+
+        def _copy(row):
+            if fields:
+                return dict((k, row[k]) for k in fields if k in row)
+            return dict(row)
+
+        if params.get('batch_results'):
+            page = paginate(results, params.get('batch', 1),
+                            params.get('batch_size', 25))
+            return [len(results), [_copy(row) for row in page]]
+
+        return [_copy(row) for row in results]
+
+    def get(self, pk):
+        for row in self.rows:
+            if row.get(self.pk) == pk:
+                return row
+        return None
+
+
+class StaffDataset(Dataset):
+    """
+    Staff directory, also answers ``auth_staff_member``
+    """
+
+    def auth_staff_member(self, identifier=None, password=None):
+        for row in self.rows:
+            if identifier in (row.get('username'), row.get('primary_email_address')):
+                if row.get('password') == password and row.get('is_enabled', True):
+                    return {'success': True, 'data': dict(row)}
+                break
+        return {'success': False, 'data': None}
+
+
+FIRST_NAMES = (
+    'Alice', 'Ben', 'Chloe', 'David', 'Emma', 'Farid', 'Grace', 'Hugo',
+    'Isla', 'Jack', 'Kemi', 'Leo', 'Maya', 'Noah', 'Olivia', 'Priya',
+)
+LAST_NAMES = (
+    'Adams', 'Baker', 'Clarke', 'Dubois', 'Evans', 'Fischer', 'Garcia',
+    'Hughes', 'Ito', 'Jones', 'Khan', 'Lopez', 'Moreau', 'Nowak',
+)
+JOB_TITLES = (
+    'Engineer', 'Senior Engineer', 'Designer', 'Product Manager',
+    'Home Manager', 'Guest Services', 'Housekeeping Lead', 'Analyst',
+)
+PERMISSION_CODES = (
+    'staff.view', 'staff.change', 'homes.view', 'homes.change',
+    'bookings.view', 'bookings.change', 'finance.view', 'finance.change',
+    'blog.change_post', 'reports.view',
+)
+
+
+def synthetic_staff(count, seed=0, password='password'):
+    """
+    Build a deterministic staff directory of ``count`` rows shaped like
+    ``query_staff_members`` results
+    """
+    rand = random.Random(seed)
+    rows = []
+    for i in xrange(1, count + 1):
+        first_name = rand.choice(FIRST_NAMES)
+        last_name = rand.choice(LAST_NAMES)
+        username = '{}.{}{}'.format(first_name, last_name, i).lower()
+        rows.append({
+            'id': i,
+            'employee_number': 10000 + i,
+            'username': username,
+            'primary_email_address': '{}@example.com'.format(username),
+            'password': password,
+            'is_enabled': rand.random() > 0.05,
+            'first_name': first_name,
+            'last_name': last_name,
+            'full_name': '{} {}'.format(first_name, last_name),
+            'job_title': rand.choice(JOB_TITLES),
+            'photo_asset_id': None,
+            'modified_at': '2014-01-01T00:00:00',
+            'all_permission_codes': sorted(
+                rand.sample(PERMISSION_CODES, rand.randint(0, 5))
+            ),
+        })
+    return rows
+
+
+DATASETS = {
+    'staff': (StaffDataset, synthetic_staff, {
+        'query_staff_members': 'query',
+        'auth_staff_member': 'auth_staff_member',
+    }),
+}
+
+
+#==============================================================================
+# Platform and proxy
+#==============================================================================
+
+
+class FakePlatform(object):
+    """
+    Routes ``topic.method`` calls to registered handlers or recordings,
+    adding configurable latency
+    """
+
+    def __init__(self, latency=0, jitter=0, latency_per_row=0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.latency_per_row = latency_per_row
+        self.handlers = {}
+        self.recordings = {}
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def register(self, topic, method, handler):
+        self.handlers[(topic, method)] = handler
+
+    def add_dataset(self, topic, dataset, methods):
+        """
+        Register dataset methods, methods maps rpc method names to the
+        dataset's method names
+        """
+        for rpc_method, attr in methods.items():
+            self.register(topic, rpc_method, getattr(dataset, attr))
+
+    def load_recordings(self, path):
+        with open(path) as f:
+            for entry in json.load(f):
+                key = _recording_key(entry['topic'], entry['method'],
+                                     entry['kwargs'])
+                self.recordings[key] = entry['response']
+
+    def call(self, topic, method, kwargs):
+        with self._lock:
+            self.calls += 1
+
+        key = _recording_key(topic, method, kwargs)
+        if key in self.recordings:
+            response = copy.deepcopy(self.recordings[key])
+        else:
+            try:
+                handler = self.handlers[(topic, method)]
+            except KeyError:
+                # as the real proxy reports a method the service lacks
+                raise RemoteError(
+                    'MethodNotFound',
+                    "Fake platform has no handler for {}.{}".format(topic, method)
+                )
+            response = handler(**kwargs)
+
+        self._wait(response)
+        return response
+
+    def _wait(self, response):
+        delay = self.latency
+        if self.jitter:
+            delay += self._random.uniform(0, self.jitter)
+        if self.latency_per_row:
+            rows = response
+            if isinstance(rows, list) and len(rows) == 2 and isinstance(rows[1], list):
+                rows = rows[1]
+            if isinstance(rows, list):
+                delay += self.latency_per_row * len(rows)
+        if delay > 0:
+            time.sleep(delay)
+
+
+class FakeRPCProxy(object):
+    """
+    Mirrors nameko's legacy RPCProxy: ``proxy.topic.method(**kwargs)``
+    """
+
+    def __init__(self, platform, info=None):
+        self.platform = platform
+        self.info = info or []
+
+    def __getattr__(self, key):
+        if key.startswith('__') or len(self.info) >= 2:
+            raise AttributeError(key)
+        return self.__class__(self.platform, self.info + [key])
+
+    def __call__(self, context=None, **kwargs):
+        if len(self.info) != 2:
+            raise ValueError('topic and method need providing')
+        topic, method = self.info
+        return self.platform.call(topic, method, kwargs)
+
+
+def build_platform(config):
+    """
+    Build a FakePlatform from a NAMEKO_FAKE_PLATFORM style dict
+    """
+    config = dict(config)
+    datasets = config.pop('datasets', {})
+    recordings = config.pop('recordings', None)
+
+    platform = FakePlatform(**config)
+
+    for topic, source in datasets.items():
+        dataset_class, generator, methods = DATASETS[topic]
+        if isinstance(source, basestring):
+            dataset = dataset_class.from_file(source)
+        else:
+            dataset = dataset_class(generator(source))
+        platform.add_dataset(topic, dataset, methods)
+
+    if recordings:
+        platform.load_recordings(recordings)
+
+    return platform
+
+
+#==============================================================================
+# Recording
+#==============================================================================
+
+
+class Recorder(object):
+    """
+    Collects calls made through a RecordingRPCProxy, save() writes a file
+    FakePlatform.load_recordings can replay
+    """
+
+    def __init__(self):
+        self.entries = []
+        self._lock = threading.Lock()
+
+    def record(self, topic, method, kwargs, response):
+        with self._lock:
+            self.entries.append({
+                'topic': topic,
+                'method': method,
+                'kwargs': kwargs,
+                'response': response,
+            })
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.entries, f, indent=1, default=str)
+
+
+class RecordingRPCProxy(object):
+    """
+    Wraps a real proxy and records every call and its response
+    """
+
+    def __init__(self, proxy, recorder, info=None):
+        self.proxy = proxy
+        self.recorder = recorder
+        self.info = info or []
+
+    def __getattr__(self, key):
+        if key.startswith('__') or len(self.info) >= 2:
+            raise AttributeError(key)
+        return self.__class__(getattr(self.proxy, key), self.recorder,
+                              self.info + [key])
+
+    def __call__(self, context=None, **kwargs):
+        response = self.proxy(context, **kwargs)
+        topic, method = self.info
+        # round trip through json so replays match what was sent
+        kwargs = json.loads(json.dumps(kwargs, default=str))
+        self.recorder.record(topic, method, kwargs, response)
+        return response
@@ -0,0 +1,9 @@
+# Settings for running the benchmark suite, which isn't installed in
+# production:
+#
+#     ./manage.py benchmark --settings=buildingofs.settings.bench
+from . import *
+
+INSTALLED_APPS += (
+    'buildingofs.benchmarks',
+)
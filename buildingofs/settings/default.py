@@ -33,6 +33,7 @@ INSTALLED_APPS = (
     'pipeline',
     'south',
 
+    'buildingofs.utils',
     'buildingofs.blog',
     'buildingofs.staff',
 )
@@ -41,9 +42,10 @@ MIDDLEWARE_CLASSES = (
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'buildingofs.staff.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'buildingofs.utils.middleware.StaticCacheControlMiddleware',
 )
 
 AUTH_USER_MODEL = "staff.Staff"
@@ -65,8 +67,60 @@ ROOT_URLCONF = 'buildingofs.urls'
 
 WSGI_APPLICATION = 'buildingofs.wsgi.application'
 
+# The cache has to be shared by every process: blog pages are invalidated
+# by bumping a content version in it (see blog/cache.py) and RPC model
+# caches by clearing keys in it. A per process cache like LocMemCache
+# would keep serving stale pages until they expire, only use one for a
+# single process development server.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': '127.0.0.1:11211',
+    }
+}
+
 CACHE_TIMEOUT = 300
 
+# models whose rows are kept in memory and synced from the platform in the
+# background, see utils/replica.py
+#     {'staff.Staff': {'interval': 60, 'full_every': 10, 'max_age': 180}}
+RPC_REPLICAS = {}
+
+# AMQP connections to NAMEKO_URL kept open per process, and how many of
+# them ofsapi.post_fork() opens before the worker takes requests
+NAMEKO_POOL_LIMIT = 10
+NAMEKO_WARM_CONNECTIONS = 2
+
+# cache warm-up tasks run at once by warm_caches and warmup.boot(), see
+# utils/warmup.py
+WARMUP_WORKERS = 4
+
+# age in seconds after which the logged in user's session snapshot is
+# refreshed in the background
+STAFF_SNAPSHOT_TTL = 300
+
+# seconds between rebuilds of the staff typeahead index, see
+# staff/search.py
+STAFF_SEARCH_INTERVAL = 600
+
+# blog pages are invalidated on save so they can be kept for much longer
+BLOG_CACHE_TIMEOUT = 60 * 60 * 24
+
+# render changed post bodies in a background thread, serving the previous
+# html until it's done
+BLOG_DEFERRED_MARKDOWN = False
+
+BLOG_PAGE_SIZE = 10
+
+BLOG_FEED_SIZE = 20
+
+BLOG_SEARCH_RESULTS = 20
+
+# directory static copies of the homepage and live posts are published to
+# for the web server to serve directly, only for requests without a query
+# string, see blog/publish.py
+BLOG_PUBLISH_ROOT = None
+
 STATIC_ROOT = os.path.realpath(BASE_DIR + '/../public/static/')
 STATIC_URL = '/static/'
 
@@ -83,7 +137,10 @@ STATICFILES_FINDERS = (
 if DEBUG or hasattr(sys, '_called_from_test'):
     STATICFILES_STORAGE = 'pipeline.storage.NonPackagingPipelineStorage'
 else:
-    STATICFILES_STORAGE = 'pipeline.storage.PipelineCachedStorage'
+    STATICFILES_STORAGE = 'buildingofs.utils.storage.ManifestPipelineStorage'
+
+# hashed static files never change, see utils/storage.py
+STATIC_MAX_AGE = 60 * 60 * 24 * 365
 
 # Internationalization
 # https://docs.djangoproject.com/en/1.6/topics/i18n/
@@ -1,10 +1,18 @@
+import os
+
+from .default import BASE_DIR
+
 PIPELINE_TEMPLATE_EXT = '.ejs'
 PIPELINE_CSS_COMPRESSOR = 'pipeline.compressors.yuglify.YuglifyCompressor'
 PIPELINE_JS_COMPRESSOR = None
 PIPELINE_COMPILERS = (
-    'pipeline.compilers.sass.SASSCompiler',
+    'buildingofs.utils.compilers.IncrementalSASSCompiler',
 )
 
+# compiled stylesheets kept by the hash of their sources, see
+# utils/compilers.py
+PIPELINE_SASS_CACHE_DIR = os.path.realpath(BASE_DIR + '/../public/sass-cache/')
+
 PIPELINE_DISABLE_WRAPPER = True
 
 PIPELINE_CSS = {
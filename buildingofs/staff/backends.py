@@ -1,7 +1,4 @@
-from django.contrib.auth.models import update_last_login
-from django.contrib.auth.signals import user_logged_in
-
-from buildingofs.ofsapi import rpc
+from buildingofs import ofsapi
 
 from .models import Staff
 
@@ -12,14 +9,16 @@ class PlatformBackend(object):
         if not all([username, password]):
             return None
 
-        result = rpc.staff.auth_staff_member(
+        result = ofsapi.rpc.staff.auth_staff_member(
             identifier=username,
             password=password
         )
 
         if result['success']:
-            user_logged_in.disconnect(update_last_login)
-            return Staff(result['data'])
+            user = Staff(result['data'])
+            # the next request looks the user up by id, don't refetch it
+            Staff.objects.prime_cache([user], id=user.id)
+            return user
 
         return None
 
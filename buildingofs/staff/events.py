@@ -0,0 +1,16 @@
+from buildingofs.ofsapi import events
+
+from .models import Staff
+
+SERVICE = 'staff'
+
+
+@events.handler(SERVICE, 'staff_member_created')
+@events.handler(SERVICE, 'staff_member_updated')
+def staff_member_changed(data):
+    Staff.objects.invalidate(data.get('id'))
+
+
+@events.handler(SERVICE, 'staff_member_deleted')
+def staff_member_deleted(data):
+    Staff.objects.evict(data.get('id'))
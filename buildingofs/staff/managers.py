@@ -5,3 +5,5 @@ class StaffManager(RPCManager):
     topic = 'staff'
     method = 'query_staff_members'
     legacy = True
+    # no replica_modified_field, the platform isn't known to support gte:
+    # filters on modified_at, so staff replicas always sync in full
@@ -0,0 +1,28 @@
+from django.contrib import auth
+from django.utils.functional import SimpleLazyObject
+
+from . import snapshot
+
+
+def get_user(request):
+    if not hasattr(request, '_cached_user'):
+        user = snapshot.get_user(request.session)
+        if user is None:
+            user = auth.get_user(request)
+            if user.is_authenticated():
+                snapshot.store(request.session, user)
+        request._cached_user = user
+    return request._cached_user
+
+
+class AuthenticationMiddleware(object):
+    """
+    Drop in replacement for django's AuthenticationMiddleware that builds
+    request.user from the session snapshot (see snapshot.py) instead of
+    asking the backend on every request
+    """
+
+    def process_request(self, request):
+        assert hasattr(request, 'session'), "The authentication middleware requires session middleware to be installed."
+
+        request.user = SimpleLazyObject(lambda: get_user(request))
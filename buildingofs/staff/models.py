@@ -1,18 +1,38 @@
+from django.contrib.auth.models import update_last_login
+from django.contrib.auth.signals import user_logged_in
+from django.dispatch import receiver
+
 from buildingofs.utils import models
 
 from . import managers
 
 
+_permission_sets = {}
+
+
+def intern_permissions(codes):
+    """
+    Return a frozenset of permission codes, shared between every user
+    with the same permissions
+    """
+    permissions = frozenset(codes)
+    return _permission_sets.setdefault(permissions, permissions)
+
+
 class PermissionsMixin(object):
+    """
+    Expects self.permissions to be a frozenset, perms can be any iterable
+    but checks against a frozenset don't allocate
+    """
 
     def has_perm(self, perm):
         return perm in self.permissions
 
     def has_any_perm(self, perms):
-        return bool(set(perms).intersection(self.permissions))
+        return not self.permissions.isdisjoint(perms)
 
     def has_perms(self, perms):
-        return bool(set(perms).issubset(self.permissions))
+        return self.permissions.issuperset(perms)
 
 
 class Staff(models.RPCModel, PermissionsMixin):
@@ -24,6 +44,8 @@ class Staff(models.RPCModel, PermissionsMixin):
     objects = managers.StaffManager()
 
     USERNAME_FIELD = "username"
+    # what __unicode__ needs, lets choice lists fetch only these
+    choice_fields = ('first_name', 'last_name')
     REQUIRED_FIELDS = []  # a hack to get django's default Auth to work. Perhaps rewrite auth custom and get rid of this?
 
     id = models.IntegerField(primary_key=True, sortable=True, verbose_name="ID")
@@ -42,12 +64,17 @@ class Staff(models.RPCModel, PermissionsMixin):
 
     @property
     def permissions(self):
-        if not hasattr(self, '_permissions'):
-            try:
-                self._permissions = self._extra_data['all_permission_codes']
-            except (AttributeError, KeyError):
-                self._permissions = []
-        return self._permissions
+        try:
+            return self._permission_set
+        except AttributeError:
+            pass
+
+        try:
+            codes = self._extra_data['all_permission_codes']
+        except (AttributeError, KeyError):
+            codes = ()
+        self._permission_set = intern_permissions(codes)
+        return self._permission_set
 
     @property
     def is_active(self):
@@ -66,3 +93,13 @@ class Staff(models.RPCModel, PermissionsMixin):
 
     def __unicode__(self):
         return ' '.join([self.first_name, self.last_name])
+
+
+# Staff live on the platform, there is no last_login to update
+user_logged_in.disconnect(update_last_login)
+
+
+@receiver(user_logged_in, sender=Staff)
+def store_session_snapshot(sender, request, user, **kwargs):
+    from .snapshot import store
+    store(request.session, user)
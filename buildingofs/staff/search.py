@@ -0,0 +1,288 @@
+"""
+In-process typeahead search over enabled staff.
+
+Every prefix of every word of the searchable fields maps to the staff
+matching it and how well they match, so a query is a few dict lookups
+whatever the number of staff. When no one matches every word of a query,
+words are matched on shared trigrams instead, which forgives typos.
+
+The index is built from one bulk fetch and rebuilt every
+STAFF_SEARCH_INTERVAL seconds in the background. Each process has its own
+index. Before a search, the members platform events reported changed or
+deleted are refetched, and only their postings are updated (see
+utils/changes.py).
+"""
+import heapq
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+
+from django.conf import settings
+
+from buildingofs.utils import changes
+
+from .models import Staff
+
+logger = logging.getLogger(__name__)
+
+# searchable fields and the weight of a match in each
+FIELDS = (
+    ('first_name', 4),
+    ('last_name', 4),
+    ('full_name', 3),
+    ('username', 2),
+    ('job_title', 1),
+)
+RESULT_FIELDS = ('id', 'full_name', 'username', 'job_title')
+ROW_FIELDS = tuple(sorted(set(name for name, weight in FIELDS) | set(RESULT_FIELDS)))
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+_index = None
+_index_lock = threading.Lock()
+_thread = None
+
+
+def normalize(text):
+    """
+    Lower case text without accents
+    """
+    if not isinstance(text, unicode):
+        text = unicode(text or '', 'utf-8')
+    text = unicodedata.normalize('NFKD', text.lower())
+    return u''.join(char for char in text if not unicodedata.combining(char))
+
+
+def words(text):
+    return WORD_RE.findall(normalize(text))
+
+
+def trigrams(word):
+    padded = u'  {} '.format(word)
+    return set(padded[i:i + 3] for i in xrange(len(padded) - 2))
+
+
+class StaffIndex(object):
+    """
+    Index of staff rows, add() and remove() update one row's postings in
+    place
+    """
+
+    def __init__(self, rows=(), generation=None):
+        # of the changes applied, see utils/changes.py
+        self.generation = generation
+        self.rows = {}
+        self.results = {}
+        # pk -> sort key, so ties rank alphabetically
+        self.order = {}
+        # pk -> the (word, weight) pairs the row is indexed under
+        self.words = {}
+        # prefix -> {pk: score}
+        self.prefixes = {}
+        # trigram -> set of pks
+        self.trigrams = {}
+        # searches read the postings add() and remove() change
+        self._lock = threading.Lock()
+
+        for row in rows:
+            self._add(row)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _weighted_words(self, row):
+        best = {}
+        for name, weight in FIELDS:
+            for word in words(row.get(name)):
+                if weight > best.get(word, 0):
+                    best[word] = weight
+        return best.items()
+
+    def _add(self, row):
+        pk = row['id']
+        self._remove(pk)
+
+        self.rows[pk] = row
+        self.results[pk] = dict((name, row.get(name)) for name in RESULT_FIELDS)
+        self.order[pk] = (normalize(row['full_name']), pk)
+        self.words[pk] = self._weighted_words(row)
+
+        for word, weight in self.words[pk]:
+            for end in xrange(1, len(word) + 1):
+                prefix = word[:end]
+                # whole words count double
+                score = weight * 2 if end == len(word) else weight
+                scores = self.prefixes.setdefault(prefix, {})
+                if score > scores.get(pk, 0):
+                    scores[pk] = score
+            for trigram in trigrams(word):
+                self.trigrams.setdefault(trigram, set()).add(pk)
+
+    def _remove(self, pk):
+        weighted_words = self.words.pop(pk, None)
+        if weighted_words is None:
+            return
+
+        del self.rows[pk]
+        del self.results[pk]
+        del self.order[pk]
+
+        for word, weight in weighted_words:
+            for end in xrange(1, len(word) + 1):
+                prefix = word[:end]
+                scores = self.prefixes.get(prefix)
+                if scores is not None:
+                    scores.pop(pk, None)
+                    if not scores:
+                        del self.prefixes[prefix]
+            for trigram in trigrams(word):
+                documents = self.trigrams.get(trigram)
+                if documents is not None:
+                    documents.discard(pk)
+                    if not documents:
+                        del self.trigrams[trigram]
+
+    def add(self, row):
+        """
+        Index row, replacing the row with the same id
+        """
+        with self._lock:
+            self._add(row)
+
+    def remove(self, pk):
+        with self._lock:
+            self._remove(pk)
+
+    def update(self, pks, rows, generation):
+        """
+        Apply the changes up to generation: rows replace the rows pks,
+        pks without a row are dropped
+        """
+        with self._lock:
+            if self.generation is not None and self.generation >= generation:
+                return
+            for pk in pks:
+                self._remove(pk)
+            for row in rows:
+                self._add(row)
+            self.generation = generation
+
+    def _prefix_scores(self, query_words):
+        matches = [self.prefixes.get(word) for word in query_words]
+        if not all(matches):
+            return {}
+
+        matches.sort(key=len)
+        first, rest = matches[0], matches[1:]
+        scores = {}
+        for document, score in first.iteritems():
+            for other in rest:
+                other_score = other.get(document)
+                if other_score is None:
+                    break
+                score += other_score
+            else:
+                scores[document] = score
+        return scores
+
+    def _trigram_scores(self, query_words):
+        scores = None
+        for word in query_words:
+            if len(word) < 3:
+                # too short to be fuzzy, still has to be a prefix
+                shared = self.prefixes.get(word, {})
+                threshold = 1
+            else:
+                word_trigrams = trigrams(word)
+                shared = defaultdict(int)
+                for trigram in word_trigrams:
+                    for document in self.trigrams.get(trigram, ()):
+                        shared[document] += 1
+                # at least half of the word's trigrams
+                threshold = (len(word_trigrams) + 1) // 2
+            if scores is None:
+                scores = dict((document, count) for document, count in shared.iteritems()
+                              if count >= threshold)
+            else:
+                scores = dict((document, score + shared[document])
+                              for document, score in scores.iteritems()
+                              if shared.get(document, 0) >= threshold)
+        return scores or {}
+
+    def search(self, query, limit=10):
+        """
+        Result dicts (see RESULT_FIELDS) of the best matches for query
+        """
+        query_words = words(query)
+        if not query_words:
+            return []
+
+        with self._lock:
+            scores = self._prefix_scores(query_words)
+            if not scores and sum(map(len, query_words)) >= 3:
+                scores = self._trigram_scores(query_words)
+
+            order = self.order
+            best = heapq.nsmallest(limit, scores.iteritems(),
+                                   key=lambda item: (-item[1], order[item[0]]))
+            return [self.results[document] for document, score in best]
+
+
+def fetch_rows(**kwargs):
+    return Staff.objects.values(*ROW_FIELDS, is_enabled='1', **kwargs)
+
+
+def rebuild():
+    global _index
+    # changes recorded from here on are applied by catch_up()
+    generation = changes.generation(Staff)
+    index = StaffIndex(fetch_rows(), generation)
+    with _index_lock:
+        _index = index
+    return index
+
+
+def catch_up(index):
+    """
+    Bring index up to date with the changes recorded since it was built
+    """
+    generation, pks = changes.since(Staff, index.generation)
+    if pks is None:
+        return rebuild()
+    if pks:
+        # disabled members aren't returned either, so they are dropped
+        rows = fetch_rows(id__in=sorted(pks))
+        index.update([Staff._meta.pk.to_python(pk) for pk in pks], rows, generation)
+    return index
+
+
+def _run():
+    while True:
+        time.sleep(settings.STAFF_SEARCH_INTERVAL)
+        try:
+            rebuild()
+        except Exception:
+            logger.exception("Rebuilding the staff search index failed")
+
+
+def get_index():
+    """
+    The current index, built on first use
+    """
+    global _thread
+    index = _index
+    if index is None:
+        index = rebuild()
+        with _index_lock:
+            if _thread is None:
+                _thread = threading.Thread(target=_run, name='staff-search')
+                _thread.daemon = True
+                _thread.start()
+    return catch_up(index)
+
+
+def search(query, limit=10):
+    return get_index().search(query, limit)
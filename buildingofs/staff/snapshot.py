@@ -0,0 +1,158 @@
+"""
+Snapshot of the logged in Staff member kept in the session.
+
+The snapshot is taken at login and lets the authentication middleware
+build request.user without going to the cache or the platform. Once a
+snapshot is older than STAFF_SNAPSHOT_TTL it is still served, but a fresh
+copy is fetched in a background thread and put in the shared cache, and
+the user's next request, on whichever worker, swaps it into the session.
+"""
+import Queue
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY, BACKEND_SESSION_KEY
+from django.core.cache import cache
+
+from .models import Staff
+
+SNAPSHOT_SESSION_KEY = '_staff_snapshot'
+
+# bump when the snapshot layout or the Staff fields change so existing
+# sessions fall back to a full lookup
+SNAPSHOT_VERSION = 1
+
+EXCLUDED_FIELDS = ('password',)
+
+# refreshes queued at once, beyond this stale snapshots are served a
+# little longer
+MAX_PENDING = 1000
+# seconds a refresh claims a user for, so only one process refreshes them
+PENDING_TIMEOUT = 30
+
+# cached for users no longer on the platform
+MISSING = False
+
+_lock = threading.Lock()
+_pending = set()
+_queue = Queue.Queue()
+_worker = None
+
+
+def _refreshed_key(user_id):
+    return 'staff.snapshot{}-{}'.format(SNAPSHOT_VERSION, user_id)
+
+
+def _pending_key(user_id):
+    return 'staff.snapshot-pending-{}'.format(user_id)
+
+
+def take(user):
+    data = user.__json__()
+    for field in EXCLUDED_FIELDS:
+        data.pop(field, None)
+    data['all_permission_codes'] = sorted(user.permissions)
+    return {
+        'version': SNAPSHOT_VERSION,
+        'id': user.pk,
+        'taken_at': time.time(),
+        'data': data,
+    }
+
+
+def store(session, user):
+    session[SNAPSHOT_SESSION_KEY] = take(user)
+
+
+def _valid(snapshot, user_id):
+    return (isinstance(snapshot, dict) and
+            snapshot.get('version') == SNAPSHOT_VERSION and
+            snapshot.get('id') == user_id)
+
+
+def _stale(snapshot):
+    return time.time() - snapshot['taken_at'] > settings.STAFF_SNAPSHOT_TTL
+
+
+def get_user(session):
+    """
+    Return the Staff member from the session snapshot, or None when there
+    is no usable snapshot and a full lookup is needed
+    """
+    try:
+        user_id = session[SESSION_KEY]
+        backend_path = session[BACKEND_SESSION_KEY]
+        snapshot = session[SNAPSHOT_SESSION_KEY]
+    except KeyError:
+        return None
+
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return None
+
+    if not _valid(snapshot, user_id):
+        return None
+
+    if _stale(snapshot):
+        refreshed = cache.get(_refreshed_key(user_id))
+        # memcached hands False back as 0
+        if refreshed == MISSING and refreshed is not None:
+            # no longer exists on the platform
+            return None
+        if _valid(refreshed, user_id) and not _stale(refreshed):
+            session[SNAPSHOT_SESSION_KEY] = snapshot = refreshed
+        else:
+            refresh_in_background(user_id)
+
+    user = Staff(snapshot['data'])
+    user.backend = backend_path
+    return user
+
+
+def refresh(user_id):
+    try:
+        snapshot = take(Staff.objects.get(id=user_id))
+    except Staff.DoesNotExist:
+        snapshot = MISSING
+    cache.set(_refreshed_key(user_id), snapshot, settings.STAFF_SNAPSHOT_TTL)
+
+
+def _refresh(user_id):
+    try:
+        refresh(user_id)
+    except Exception:
+        # keep serving the old snapshot, the next stale request retries
+        pass
+    finally:
+        cache.delete(_pending_key(user_id))
+        with _lock:
+            _pending.discard(user_id)
+
+
+def _work():
+    while True:
+        _refresh(_queue.get())
+
+
+def refresh_in_background(user_id):
+    global _worker
+
+    with _lock:
+        if user_id in _pending or len(_pending) >= MAX_PENDING:
+            return
+        _pending.add(user_id)
+
+    # another process may be refreshing them already
+    if not cache.add(_pending_key(user_id), True, PENDING_TIMEOUT):
+        with _lock:
+            _pending.discard(user_id)
+        return
+
+    with _lock:
+        # one worker per process, a forked child starts its own
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_work, name='staff-snapshot')
+            _worker.daemon = True
+            _worker.start()
+
+    _queue.put(user_id)
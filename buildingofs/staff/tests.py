@@ -1,3 +1,270 @@
-from django.test import TestCase
+import Queue
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import update_last_login
+from django.contrib.auth.signals import user_logged_in
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.dispatch.dispatcher import _make_id
+from django.test.utils import override_settings
+
+from buildingofs import ofsapi
+from buildingofs.ofsapi import events as platform_events
+from buildingofs.ofsapi.fake import FakeRPCProxy, build_platform
+from buildingofs.utils import changes, replica
+
+from . import events  # registers the handlers
+from . import search, snapshot, warmup
+from .backends import PlatformBackend
+from .models import Staff, intern_permissions
+
+
+@override_settings(RPC_REPLICAS={'staff.Staff': {'interval': 3600}})
+class DeletedStaffTest(TestCase):
+
+    def setUp(self):
+        platform = build_platform({'datasets': {'staff': 20}})
+        self.rows = platform.handlers[('staff', 'query_staff_members')].__self__.rows
+        self.previous = ofsapi.install(FakeRPCProxy(platform))
+        replica._replicas.clear()
+        search._index = None
+        Staff.objects.clear_cache()
+
+        self.assertTrue(replica.get_replica(Staff.objects).ready.wait(10))
+        self.assertEqual(len(Staff.objects.filter(id=5)), 1)
+        Staff.objects.get_cached(id=5)
+
+    def tearDown(self):
+        ofsapi.install(self.previous)
+        replica._replicas.clear()
+        search._index = None
+        Staff.objects.clear_cache()
+
+    def delete(self, pk):
+        self.rows[:] = [row for row in self.rows if row['id'] != pk]
+
+    def assertGone(self, pk):
+        self.assertEqual(Staff.objects.filter(id=pk), [])
+        with self.assertRaises(Staff.DoesNotExist):
+            Staff.objects.get_cached(id=pk)
+
+    def test_deleted_event(self):
+        self.delete(5)
+        platform_events.dispatch('staff', 'staff_member_deleted', {'id': 5})
+        self.assertGone(5)
+        self.assertEqual(len(Staff.objects.filter(id=6)), 1)
+
+    def test_invalidate_deleted(self):
+        self.delete(5)
+        Staff.objects.invalidate(5)
+        self.assertGone(5)
+
+    def test_deleted_from_search(self):
+        staff = Staff.objects.get_cached(id=5)
+        search.get_index()
+        self.assertIn(5, [result['id'] for result in search.search(staff.full_name)])
+
+        self.delete(5)
+        platform_events.dispatch('staff', 'staff_member_deleted', {'id': 5})
+        self.assertNotIn(5, [result['id'] for result in search.search(staff.full_name)])
+
+    def test_search_catches_up_in_place(self):
+        index = search.get_index()
+        for row in self.rows:
+            if row['id'] == 6:
+                row['first_name'] = 'Zebedee'
+        self.delete(7)
+        # as recorded by the platform_events process
+        changes.record(Staff, 6)
+        changes.record(Staff, 7)
+
+        self.assertEqual([result['id'] for result in search.search('zebedee')], [6])
+        self.assertNotIn(7, search.get_index().rows)
+        self.assertIs(search.get_index(), index)
+
+
+class PlatformBackendTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.platform = build_platform({'datasets': {'staff': 5}})
+        rows = self.platform.handlers[('staff', 'query_staff_members')].__self__.rows
+        self.row = [row for row in rows if row['is_enabled']][0]
+        self.previous = ofsapi.install(FakeRPCProxy(self.platform))
+
+    def tearDown(self):
+        ofsapi.install(self.previous)
+
+    def test_user_cached_at_login(self):
+        backend = PlatformBackend()
+        user = backend.authenticate(self.row['username'], 'password')
+        self.assertEqual(user.id, self.row['id'])
+
+        calls = self.platform.calls
+        self.assertEqual(backend.get_user(user.id).username, user.username)
+        self.assertEqual(self.platform.calls, calls)
+
+    def test_wrong_password(self):
+        self.assertIsNone(PlatformBackend().authenticate(self.row['username'], 'wrong'))
+        self.assertIsNone(PlatformBackend().authenticate(self.row['username'], ''))
+
+    def test_no_last_login(self):
+        receivers = [key[0] for key, receiver in user_logged_in.receivers]
+        self.assertNotIn(_make_id(update_last_login), receivers)
+
+
+class WarmupTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.platform = build_platform({'datasets': {'staff': 5}})
+        rows = self.platform.handlers[('staff', 'query_staff_members')].__self__.rows
+        for row in rows:
+            row['is_enabled'] = row['id'] != 4
+        self.previous = ofsapi.install(FakeRPCProxy(self.platform))
+
+    def tearDown(self):
+        ofsapi.install(self.previous)
+
+    def test_members(self):
+        warmup.members()
+        calls = self.platform.calls
+        for pk in [1, 2, 3, 5]:
+            Staff.objects.get_cached(id=pk)
+        self.assertEqual(self.platform.calls, calls)
+        Staff.objects.get_cached(id=4)
+        self.assertEqual(self.platform.calls, calls + 1)
+
+    def test_choices(self):
+        warmup.choices()
+        calls = self.platform.calls
+        self.assertEqual(len(Staff.objects.only(*Staff.choice_fields).cached()), 5)
+        self.assertEqual(self.platform.calls, calls)
+
+
+def staff_row(pk, first_name, last_name, job_title=''):
+    return {
+        'id': pk,
+        'first_name': first_name,
+        'last_name': last_name,
+        'full_name': u'{} {}'.format(first_name, last_name),
+        'username': first_name.lower(),
+        'job_title': job_title,
+    }
+
+
+class PermissionsTest(SimpleTestCase):
+
+    def staff(self, pk, codes):
+        return Staff(dict(staff_row(pk, 'Anna', 'Baker'), all_permission_codes=codes))
+
+    def test_shared_between_users(self):
+        first = self.staff(1, ['staff.view', 'homes.view'])
+        second = self.staff(2, ['homes.view', 'staff.view'])
+        self.assertIs(first.permissions, second.permissions)
+        self.assertIs(first.permissions, intern_permissions(['staff.view', 'homes.view']))
+        self.assertEqual(Staff(staff_row(3, 'Mark', 'Jones')).permissions, frozenset())
+
+    def test_checks(self):
+        staff = self.staff(1, ['staff.view', 'homes.view'])
+        self.assertTrue(staff.has_perm('staff.view'))
+        self.assertFalse(staff.has_perm('staff.change'))
+        self.assertTrue(staff.has_perms(['staff.view', 'homes.view']))
+        self.assertFalse(staff.has_perms(frozenset(['staff.view', 'staff.change'])))
+        self.assertTrue(staff.has_any_perm(('staff.change', 'homes.view')))
+        self.assertFalse(staff.has_any_perm(['staff.change']))
+
+
+class StaffIndexTest(SimpleTestCase):
+
+    def setUp(self):
+        self.rows = [
+            staff_row(1, 'Zoe', 'Baker', 'Engineer'),
+            staff_row(2, 'Anna', 'Baker', 'Designer'),
+            staff_row(3, 'Mark', 'Jones', 'Engineer'),
+        ]
+
+    def ids(self, index, query):
+        return [result['id'] for result in index.search(query)]
+
+    def test_ties_rank_by_name(self):
+        index = search.StaffIndex(self.rows)
+        self.assertEqual(self.ids(index, 'bak'), [2, 1])
+
+    def test_add_and_remove(self):
+        index = search.StaffIndex(self.rows)
+        index.add(staff_row(4, 'Bob', 'Baker'))
+        index.add(staff_row(1, 'Zoe', 'Smith', 'Engineer'))
+        index.remove(2)
+        self.assertEqual(self.ids(index, 'baker'), [4])
+        self.assertEqual(self.ids(index, 'engineer'), [3, 1])
+
+        rows = [self.rows[2], staff_row(1, 'Zoe', 'Smith', 'Engineer'),
+                staff_row(4, 'Bob', 'Baker')]
+        rebuilt = search.StaffIndex(rows)
+        self.assertEqual(index.prefixes, rebuilt.prefixes)
+        self.assertEqual(index.trigrams, rebuilt.trigrams)
+
+    def test_typos(self):
+        index = search.StaffIndex(self.rows)
+        self.assertEqual(self.ids(index, 'jonnes'), [3])
+        # too few trigrams in common
+        self.assertEqual(self.ids(index, 'jxxxxs'), [])
+
+
+class SnapshotTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        platform = build_platform({'datasets': {'staff': 5}})
+        self.rows = platform.handlers[('staff', 'query_staff_members')].__self__.rows
+        self.previous = ofsapi.install(FakeRPCProxy(platform))
+
+        self.refreshes = []
+        self._refresh_in_background = snapshot.refresh_in_background
+        snapshot.refresh_in_background = self.refreshes.append
+
+        taken = snapshot.take(Staff.objects.get(id=3))
+        taken['taken_at'] -= settings.STAFF_SNAPSHOT_TTL + 1
+        self.session = {
+            SESSION_KEY: 3,
+            BACKEND_SESSION_KEY: settings.AUTHENTICATION_BACKENDS[0],
+            snapshot.SNAPSHOT_SESSION_KEY: taken,
+        }
+
+    def tearDown(self):
+        snapshot.refresh_in_background = self._refresh_in_background
+        ofsapi.install(self.previous)
+
+    def test_refreshed_on_any_worker(self):
+        name = snapshot.get_user(self.session).first_name
+        self.assertEqual(self.refreshes, [3])
+
+        for row in self.rows:
+            if row['id'] == 3:
+                row['first_name'] = 'Renamed'
+        # in the worker thread of another process
+        snapshot.refresh(3)
+
+        self.assertNotEqual(name, 'Renamed')
+        self.assertEqual(snapshot.get_user(self.session).first_name, 'Renamed')
+        self.assertEqual(self.refreshes, [3])
+        self.assertFalse(snapshot._stale(self.session[snapshot.SNAPSHOT_SESSION_KEY]))
+
+    def test_deleted_user(self):
+        self.rows[:] = [row for row in self.rows if row['id'] != 3]
+        snapshot.refresh(3)
+        self.assertIsNone(snapshot.get_user(self.session))
+
+    def test_one_refresh_across_processes(self):
+        snapshot.refresh_in_background = self._refresh_in_background
+        queue, snapshot._queue = snapshot._queue, Queue.Queue()
+        worker, snapshot._worker = snapshot._worker, None
+        try:
+            cache.add(snapshot._pending_key(3), True)
+            snapshot.refresh_in_background(3)
+            self.assertTrue(snapshot._queue.empty())
+            self.assertNotIn(3, snapshot._pending)
+        finally:
+            snapshot._queue, snapshot._worker = queue, worker
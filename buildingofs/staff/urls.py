@@ -0,0 +1,7 @@
+from django.conf.urls import patterns, url
+
+from . import views
+
+urlpatterns = patterns('',
+    url(r'^search/$', views.StaffSearchView.as_view(), name='staff-search'),
+)
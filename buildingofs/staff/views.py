@@ -1,3 +1,29 @@
-from django.shortcuts import render
+import json
 
-# Create your views here.
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.generic import View
+
+from buildingofs.utils.views import PermissionsMixin
+
+from . import search
+
+MAX_RESULTS = 50
+
+
+class StaffSearchView(PermissionsMixin, View):
+    """ Typeahead matches for ?q=, as JSON """
+
+    permissions = {'all': ('staff.view',)}
+
+    def get(self, request):
+        try:
+            limit = min(int(request.GET.get('limit', 10)), MAX_RESULTS)
+        except ValueError:
+            limit = 10
+
+        results = search.search(request.GET.get('q', ''), max(limit, 1))
+        response = HttpResponse(json.dumps({'results': results}),
+                                content_type='application/json')
+        patch_cache_control(response, private=True, max_age=60)
+        return response
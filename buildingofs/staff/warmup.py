@@ -0,0 +1,24 @@
+from buildingofs.utils import warmup
+
+from .models import Staff
+
+
+@warmup.task('staff.members')
+def members():
+    """
+    Primes each enabled staff member's cached entry, which the
+    authentication backend looks up on every request, with one call
+    """
+    Staff.objects.prime_cache_many(
+        ({'id': staff.id}, [staff]) for staff in Staff.objects.filter(is_enabled='1'))
+
+
+@warmup.task('staff.choices')
+def choices():
+    Staff.objects.only(*Staff.choice_fields).cached()
+
+
+@warmup.task('staff.search', process=True)
+def search_index():
+    from .search import get_index
+    get_index()
@@ -6,6 +6,7 @@ from . import views
 urlpatterns = patterns('',
     url(r'^$', views.HomepageView.as_view(), name='home'),
     url(r'^blog/', include('buildingofs.blog.urls')),
+    url(r'^staff/', include('buildingofs.staff.urls')),
 
     url(r'^login/$', auth_views.login, {'template_name': 'account/login.html'}, name='login'),
     url(r'^logout/$', auth_views.logout, {'template_name': 'account/logout.html'}, name='logout'),
@@ -0,0 +1,89 @@
+"""
+Changes to platform rows, shared between processes.
+
+Platform events are handled by the platform_events process, but each web
+worker keeps its own copies of platform rows, such as replicas (see
+replica.py) and the staff search index. So event handlers don't touch
+those copies. They record() the change in the shared cache instead: a
+per model generation, and the row each generation changed. Before using
+a copy, a process asks for the changes since the generation the copy is
+at and applies them:
+
+    generation, pks = changes.since(Staff, index.generation)
+    if pks is None:
+        # too far behind, or the changes expired, start over
+        ...
+
+CACHES must be a shared backend for changes to reach other processes.
+"""
+import time
+
+from django.core.cache import cache
+
+# changes kept per model, copies further behind start over
+MAX_CHANGES = 1000
+CHANGE_TIMEOUT = 60 * 60
+
+
+def _key(model, name):
+    return '{}.{}-{}'.format(model._meta.app_label, model._meta.object_name, name)
+
+
+def generation(model):
+    """
+    The model's current generation
+    """
+    key = _key(model, 'GENERATION')
+    value = cache.get(key)
+    if value is None:
+        # first use, or the cache lost it. Starting from the time rather
+        # than 0 keeps generations growing, so copies made before can't
+        # mistake a later generation for theirs
+        cache.add(key, int(time.time() * 1000), None)
+        value = cache.get(key, 0)
+    return value
+
+
+def record(model, pk=None):
+    """
+    Record that the platform changed, added or deleted the row pk, or
+    any of the rows without pk
+
+    Returns the new generation
+    """
+    key = _key(model, 'GENERATION')
+    generation(model)
+    try:
+        value = cache.incr(key)
+    except ValueError:
+        # lost meanwhile, starting over makes every copy start over too
+        return generation(model)
+    cache.set(_key(model, 'CHANGE-{}'.format(value)), (pk,), CHANGE_TIMEOUT)
+    return value
+
+
+def since(model, seen):
+    """
+    (current generation, pks of the rows changed since generation seen)
+
+    pks is None when the changes can't be told, copies have to start over
+    """
+    current = generation(model)
+    if current == seen:
+        return current, set()
+    if seen is None or not 0 < current - seen <= MAX_CHANGES:
+        return current, None
+
+    keys = [_key(model, 'CHANGE-{}'.format(value))
+            for value in xrange(seen + 1, current + 1)]
+    found = cache.get_many(keys)
+    if len(found) < len(keys):
+        # expired, or recorded but not written yet
+        return current, None
+
+    pks = set()
+    for pk, in found.itervalues():
+        if pk is None:
+            return current, None
+        pks.add(unicode(pk))
+    return current, pks
@@ -0,0 +1,118 @@
+"""
+Choice tables built from settings on first use and shared by every field
+using them.
+"""
+import threading
+
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+
+from pytz import common_timezones
+
+
+class LazyChoices(object):
+    """
+    A sequence of (value, label) pairs built by build() the first time
+    it's used, with a set of the values for O(1) membership checks
+
+    Always true, so django treats a field given one as having choices
+    without building it
+    """
+
+    def __init__(self, build, settings=()):
+        self.build = build
+        # settings the table is built from, it's rebuilt when they change
+        self.settings = settings
+        self._choices = None
+        self._values = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        choices = self._choices
+        if choices is None:
+            with self._lock:
+                if self._choices is None:
+                    choices = tuple(self.build())
+                    self._values = frozenset(value for value, label in choices)
+                    self._choices = choices
+                choices = self._choices
+        return choices
+
+    @property
+    def values(self):
+        self._load()
+        return self._values
+
+    def reset(self):
+        with self._lock:
+            self._choices = self._values = None
+
+    def __nonzero__(self):
+        return True
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+    def __getitem__(self, index):
+        return self._load()[index]
+
+    def __add__(self, other):
+        return list(self._load()) + list(other)
+
+    def __radd__(self, other):
+        return list(other) + list(self._load())
+
+    def __contains__(self, choice):
+        return choice in self._load()
+
+
+def _by_label(choices):
+    return sorted(choices, key=lambda choice: choice[1])
+
+
+def _cities():
+    from django.conf import settings
+    return _by_label((code, data['name'])
+                     for code, data in settings.SUPPORTED_CITIES.items())
+
+
+def _city_timezones():
+    from django.conf import settings
+    return _by_label(set((data['timezone'], data['timezone'])
+                         for data in settings.SUPPORTED_CITIES.values()
+                         if 'timezone' in data))
+
+
+def _timezones():
+    return _by_label((timezone, timezone) for timezone in common_timezones)
+
+
+def _city_locales():
+    from django.conf import settings
+    return _by_label(set((data['locale'], data['locale'])
+                         for data in settings.SUPPORTED_CITIES.values()
+                         if 'locale' in data))
+
+
+def _country_codes():
+    from django.conf import settings
+    return _by_label(settings.COUNTRY_CODES.items())
+
+
+CITIES = LazyChoices(_cities, ('SUPPORTED_CITIES',))
+CITY_TIMEZONES = LazyChoices(_city_timezones, ('SUPPORTED_CITIES',))
+TIMEZONES = LazyChoices(_timezones)
+CITY_LOCALES = LazyChoices(_city_locales, ('SUPPORTED_CITIES',))
+COUNTRY_CODES = LazyChoices(_country_codes, ('COUNTRY_CODES',))
+
+TABLES = (CITIES, CITY_TIMEZONES, TIMEZONES, CITY_LOCALES, COUNTRY_CODES)
+
+
+@receiver(setting_changed)
+def reset_tables(sender, setting, **kwargs):
+    for table in TABLES:
+        if setting in table.settings:
+            table.reset()
@@ -0,0 +1,187 @@
+"""
+SASS compiler for the pipeline that only recompiles what changed.
+
+The stock SASSCompiler runs sass for every stylesheet every time. This
+one follows @import statements to find the partials each stylesheet is
+built from and fingerprints their contents. A stylesheet is only
+compiled when its fingerprint changes, and compiled output is kept in
+PIPELINE_SASS_CACHE_DIR by fingerprint, so going back to an earlier
+version of the styles (another branch, a rollback) copies the css
+instead of compiling it again.
+
+Bundles are already compiled in parallel by pipeline's Compiler.
+"""
+import hashlib
+import json
+import os
+import re
+import shlex
+import shutil
+import tempfile
+import threading
+
+from pipeline.compilers.sass import SASSCompiler
+from pipeline.conf import settings
+
+try:
+    from shlex import quote
+except ImportError:
+    from pipes import quote
+
+COMMENT_RE = re.compile(r'/\*.*?\*/|//[^\n]*', re.DOTALL)
+IMPORT_RE = re.compile(r'@import\s+([^;]+);')
+STRING_RE = re.compile(r'''["']([^"']+)["']''')
+
+MANIFEST_NAME = 'manifest.json'
+
+# path -> (mtime, size, sha1, imports), reread when the file changes
+_files = {}
+_manifest_lock = threading.Lock()
+
+
+def _candidates(name, directory):
+    """
+    Files sass would try for `@import "name"` in directory
+    """
+    path = os.path.join(directory, name)
+    head, tail = os.path.split(path)
+    if tail.endswith(('.scss', '.sass')):
+        return [path, os.path.join(head, '_' + tail)]
+
+    candidates = []
+    for ext in ('.scss', '.sass'):
+        candidates.append(path + ext)
+        candidates.append(os.path.join(head, '_' + tail + ext))
+    return candidates
+
+
+def parse_imports(content, directory):
+    """
+    Resolved paths of the stylesheets content imports, imports of plain
+    css and urls are left to the browser and skipped
+    """
+    paths = []
+    for statement in IMPORT_RE.findall(COMMENT_RE.sub('', content)):
+        if 'url(' in statement:
+            continue
+        for name in STRING_RE.findall(statement):
+            if name.endswith('.css') or '://' in name:
+                continue
+            for candidate in _candidates(name, directory):
+                if os.path.isfile(candidate):
+                    paths.append(os.path.realpath(candidate))
+                    break
+    return paths
+
+
+def _file_info(path):
+    stat = os.stat(path)
+    info = _files.get(path)
+    if info is None or info[:2] != (stat.st_mtime, stat.st_size):
+        with open(path, 'rb') as f:
+            content = f.read()
+        digest = hashlib.sha1(content).hexdigest()
+        imports = parse_imports(content, os.path.dirname(path))
+        info = _files[path] = (stat.st_mtime, stat.st_size, digest, imports)
+    return info
+
+
+def dependencies(path):
+    """
+    The stylesheet at path and everything it imports, directly or not
+    """
+    path = os.path.realpath(path)
+    seen = []
+    pending = [path]
+    while pending:
+        current = pending.pop()
+        if current in seen:
+            continue
+        seen.append(current)
+        pending.extend(_file_info(current)[3])
+    return seen
+
+
+def fingerprint(path, command=''):
+    """
+    Hash of the contents of path and its dependencies and of the command
+    that compiles them
+    """
+    sha = hashlib.sha1(command.encode('utf-8'))
+    for dependency in sorted(dependencies(path)):
+        sha.update(dependency)
+        sha.update(_file_info(dependency)[2])
+    return sha.hexdigest()
+
+
+def _copy_atomic(source, destination):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(destination), prefix='.sass-')
+    os.close(fd)
+    try:
+        shutil.copyfile(source, tmp_path)
+        os.chmod(tmp_path, 0644)
+        os.rename(tmp_path, destination)
+    except:
+        os.unlink(tmp_path)
+        raise
+
+
+class IncrementalSASSCompiler(SASSCompiler):
+
+    @property
+    def cache_dir(self):
+        return settings.PIPELINE_SASS_CACHE_DIR
+
+    def read_manifest(self):
+        try:
+            with open(os.path.join(self.cache_dir, MANIFEST_NAME)) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+    def update_manifest(self, outfile, digest):
+        with _manifest_lock:
+            manifest = self.read_manifest()
+            manifest[outfile] = digest
+            path = os.path.join(self.cache_dir, MANIFEST_NAME)
+            with open(path + '.tmp', 'w') as f:
+                json.dump(manifest, f, indent=1, sort_keys=True)
+            os.rename(path + '.tmp', path)
+
+    def compile_file(self, infile, outfile, outdated=False, force=False):
+        # Compiler.compile hands over shell quoted paths
+        infile, outfile = shlex.split(infile)[0], shlex.split(outfile)[0]
+
+        command = '{} {}'.format(settings.PIPELINE_SASS_BINARY,
+                                 settings.PIPELINE_SASS_ARGUMENTS)
+        digest = fingerprint(infile, command)
+
+        if not force and os.path.exists(outfile) and \
+                self.read_manifest().get(outfile) == digest:
+            return
+
+        if not os.path.isdir(self.cache_dir):
+            try:
+                os.makedirs(self.cache_dir)
+            except OSError:
+                # made by another thread meanwhile
+                if not os.path.isdir(self.cache_dir):
+                    raise
+
+        cached = os.path.join(self.cache_dir, digest + '.css')
+        if force or not os.path.exists(cached):
+            # a name that doesn't exist yet, sass --update skips outputs
+            # newer than their input
+            compiled = os.path.join(self.cache_dir, '.{}-{}-{}.css'.format(
+                digest, os.getpid(), threading.current_thread().ident))
+            try:
+                super(IncrementalSASSCompiler, self).compile_file(
+                    quote(infile), quote(compiled), outdated=True, force=force)
+                os.rename(compiled, cached)
+            except:
+                if os.path.exists(compiled):
+                    os.unlink(compiled)
+                raise
+
+        _copy_atomic(cached, outfile)
+        self.update_manifest(outfile, digest)
@@ -0,0 +1,131 @@
+"""
+Column at a time conversion of raw platform rows.
+
+Converting a page of rows one model at a time repeats the same work for
+every value: looking up the decimal context, building the quantize
+exponent, parsing the same dates again. Converting a column at a time
+sets that up once per column. It also memoises conversions whose
+results are immutable, so repeated dates or amounts are parsed once.
+"""
+from decimal import Context, Decimal, InvalidOperation, ROUND_HALF_EVEN
+
+from django.db import models
+
+# the precision and rounding of decimal's default context, shared so
+# conversions don't fetch the thread's context for every value
+CONTEXT = Context(prec=28, rounding=ROUND_HALF_EVEN)
+TWO_PLACES = Decimal('0.00')
+HUNDRED = Decimal(100)
+
+# fields converting to immutable values, safe to memoise
+MEMOISED_FIELDS = (
+    models.DateTimeField,
+    models.DateField,
+    models.TimeField,
+    models.DecimalField,
+)
+# raw values memoised by (type, value). Equal values of other types can
+# still convert differently, Decimal('1.5') and Decimal('1.50') or the
+# same instant in two timezones, so they are converted every time
+MEMOISED_TYPES = frozenset((str, unicode, int, long))
+
+
+def batches(field):
+    """
+    Whether converting field a column at a time beats to_python per value,
+    other fields are cheaper to convert as each model is built
+    """
+    return isinstance(field, MEMOISED_FIELDS)
+
+
+def _to_decimal(field, value):
+    if isinstance(value, Decimal):
+        return value
+    try:
+        return Decimal(value)
+    except (InvalidOperation, TypeError, ValueError):
+        # let the field raise its own validation error
+        return field.to_python(value)
+
+
+def _decimal_converter(field):
+    def convert(value):
+        if value is None:
+            return None
+        value = _to_decimal(field, value)
+        if value:
+            return value.quantize(TWO_PLACES, context=CONTEXT)
+        return value
+    return convert
+
+
+def _penny_converter(field):
+    def convert(value):
+        if isinstance(value, Decimal):
+            # already converted
+            return value
+        if value is None:
+            return field.to_python(value)
+        return CONTEXT.divide(_to_decimal(field, value), HUNDRED)
+    return convert
+
+
+def value_converter(field):
+    """
+    Function converting one raw value for field, the same as
+    field.to_python
+    """
+    from .models import DecimalField, PennyField
+
+    if isinstance(field, PennyField):
+        return _penny_converter(field)
+    if isinstance(field, DecimalField):
+        return _decimal_converter(field)
+    return field.to_python
+
+
+def column_converter(field):
+    """
+    Function converting a list of raw values for field
+    """
+    convert = value_converter(field)
+
+    if not batches(field):
+        return lambda values: [convert(value) for value in values]
+
+    def convert_column(values):
+        memo = {}
+        converted = []
+        append = converted.append
+        for value in values:
+            cls = value.__class__
+            if cls not in MEMOISED_TYPES:
+                append(convert(value))
+                continue
+            # 1 and True hash alike but may convert differently
+            key = (cls, value)
+            try:
+                result = memo[key]
+            except KeyError:
+                result = memo[key] = convert(value)
+            append(result)
+        return converted
+    return convert_column
+
+
+def convert_columns(fields, rows):
+    """
+    Convert rows a column at a time
+
+    fields - [(row key, field)]
+    rows - list of raw rows
+
+    Returns {row key: [converted values]}, missing keys are converted from
+    the field's default
+    """
+    columns = {}
+    for key, field in fields:
+        default = field.get_default()
+        values = [row.get(key, default) for row in rows]
+        columns[key] = column_converter(field)(values)
+    return columns
@@ -0,0 +1,28 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from buildingofs.ofsapi import events
+
+
+class Command(BaseCommand):
+    help = ("Listen for platform events and invalidate the caches of the "
+            "models they change.")
+    option_list = BaseCommand.option_list + (
+        make_option('--uri', dest='uri', default=None,
+                    help="AMQP uri to consume from, defaults to NAMEKO_URL."),
+    )
+
+    def handle(self, *args, **options):
+        events.autodiscover()
+        if not events.handlers:
+            raise CommandError("No platform event handlers are registered.")
+
+        if int(options['verbosity']):
+            for service, event_type in sorted(events.handlers):
+                self.stdout.write("Listening for {}.{}".format(service, event_type))
+
+        try:
+            events.listen(options['uri'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,32 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from buildingofs.utils import warmup
+
+
+class Command(BaseCommand):
+    args = '[name ...]'
+    help = ("Fill the caches the first requests after a deploy would miss, "
+            "optionally only the warm-up tasks starting with the given names.")
+    option_list = BaseCommand.option_list + (
+        make_option('--workers', dest='workers', type='int', default=None,
+                    help="Tasks to run at once, defaults to WARMUP_WORKERS."),
+    )
+
+    def handle(self, *names, **options):
+        warmup.autodiscover()
+        results = warmup.run(names, options['workers'])
+        if not results:
+            raise CommandError("No warm-up tasks match.")
+
+        verbosity = int(options['verbosity'])
+        failed = [name for name, seconds, error in results if error is not None]
+        if verbosity:
+            for name, seconds, error in sorted(results):
+                status = 'failed: {}'.format(error) if error is not None else 'ok'
+                self.stdout.write("{:<40} {:>8.1f} ms  {}".format(
+                    name, seconds * 1000, status))
+        if failed:
+            raise CommandError("{} of {} warm-up tasks failed.".format(
+                len(failed), len(results)))
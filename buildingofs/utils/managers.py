@@ -1,14 +1,19 @@
+import copy
 import hashlib
 import math
+from collections import namedtuple
 
 from django.conf import settings
 from django.core.cache import cache
 from django.db import models
-from django.forms.models import model_to_dict
 
-from buildingofs.ofsapi import rpc
+from buildingofs import ofsapi
 
+from . import changes
+from .conversion import batches, convert_columns
 from .filters import validate_filter, get_operator, process_filter
+from .query import paginate
+from .replica import get_replica
 
 
 class RPCManager(models.Manager):
@@ -18,15 +23,90 @@ class RPCManager(models.Manager):
     filters = {}
     rpc_kwargs = {}  # extra rpc kwargs to send
     CACHE_TIMEOUT = settings.CACHE_TIMEOUT
+    # field the platform bumps on change, lets replicas sync deltas
+    replica_modified_field = None
+    # rpc kwarg taking the list of fields to return, for platform methods
+    # that support it (see only())
+    fields_kwarg = None
+    _fields = None
+    # kwargs of the cached() queries worth fetching before traffic arrives,
+    # see utils/warmup.py
+    warm_queries = ()
 
     def _legacy_rpc_call(self, method, params, **rpc_kwargs):
         return method(params=params, **rpc_kwargs)
 
+    def only(self, *fields):
+        """
+        Copy of the manager that only converts fields (and the pk), and
+        only asks the platform for them when it can
+
+            Staff.objects.only('first_name', 'last_name').all()
+
+        The other fields are None on the models it returns
+        """
+        pk_name = self.model._meta.pk.name
+        names = set(fields) | set([pk_name])
+        for name in names:
+            if self.model.get_field(name) is None:
+                raise ValueError("{} has no field {}".format(
+                    self.model._meta.object_name, name))
+
+        manager = copy.copy(self)
+        manager._fields = frozenset(names)
+        return manager
+
+    def defer(self, *fields):
+        """
+        Copy of the manager that skips fields, see only()
+        """
+        return self.only(*[f.name for f in self.model.get_fields()
+                           if f.name not in fields])
+
+    def _projection_kwargs(self):
+        if self._fields is None or self.fields_kwarg is None:
+            return {}
+        name_map = getattr(self.model, 'name_map', None) or {}
+        keys = sorted(name_map.get(f.attname) or f.attname
+                      for f in self.model.get_fields() if f.name in self._fields)
+        return {self.fields_kwarg: keys}
+
+    def _build(self, rows):
+        """
+        Models from raw rows, converted a column at a time (see
+        conversion.py)
+        """
+        converters = self._converters(self._fields)
+        fields = [(key, field) for name, key, field in converters if batches(field)]
+        if not fields:
+            return [self.model(row, _only=self._fields) for row in rows]
+
+        columns = convert_columns(fields, rows)
+        keys = columns.keys()
+        models = []
+        for i, row in enumerate(rows):
+            converted = dict((key, columns[key][i]) for key in keys)
+            models.append(self.model(row, _only=self._fields, _converted=converted))
+        return models
+
+    @property
+    def replica(self):
+        """
+        The local replica of the model's rows, None unless it's enabled in
+        RPC_REPLICAS and has synced within its max_age (see replica.py)
+        """
+        replica = get_replica(self)
+        if replica is None or not replica.ready.is_set() or not replica.is_fresh():
+            return None
+        # changes platform events recorded, maybe in another process
+        replica.catch_up()
+        return replica
+
     def rpc_call(self, params, topic=None, method=None, rpc_kwargs=None):
         topic = topic if topic is not None else self.topic
         method = method if method is not None else self.method
 
-        _topic = getattr(rpc, topic)
+        _topic = getattr(ofsapi.rpc, topic)
         _method = getattr(_topic, method)
 
         _rpc_kwargs = getattr(self, 'rpc_kwargs').copy()
@@ -47,7 +127,13 @@ class RPCManager(models.Manager):
         Account.objects.filter(booking_ref='DBKSJ43')
         Account.objects.filter(booking_ref__contains='DBK')
         """
+        models = self._build(self.raw_filter(sort_by, sort_desc, rpc_kwargs, **kwargs))
+        return models
 
+    def raw_filter(self, sort_by=None, sort_desc=False, rpc_kwargs=None, **kwargs):
+        """
+        Like filter() but returns the platform's rows as they are
+        """
         pk = kwargs.pop('pk', None)
 
         filters = self.filters.copy()
@@ -58,6 +144,14 @@ class RPCManager(models.Manager):
 
         _filters = self.convert_filters(filters)
 
+        replica = self.replica if rpc_kwargs is None else None
+        if replica is not None:
+            return replica.query(_filters, sort_by, sort_desc)
+
+        projection = self._projection_kwargs()
+        if projection:
+            rpc_kwargs = dict(rpc_kwargs or {}, **projection)
+
         params = {
             'batch_results': False,
             'sort_by': sort_by,
@@ -65,13 +159,10 @@ class RPCManager(models.Manager):
             'filters': _filters,
         }
 
-        results = self.preprocess_rpc_response(
+        return self.preprocess_rpc_response(
             self.rpc_call(params, rpc_kwargs=rpc_kwargs)
         )
 
-        models = map(self.model, results)
-        return models
-
     def preprocess_rpc_response(self, response):
         """
         Override this function if you need to manipulate data before
@@ -87,16 +178,19 @@ class RPCManager(models.Manager):
     def all(self, **kwargs):
         return self.filter(**kwargs)
 
-    def _cache_key(self, **kwargs):
+    def _cache_prefix(self):
+        # the generation changes with every change recorded, which drops
+        # every cached result (see changes.py)
         app = self.model._meta.app_label
         model = self.model._meta.object_name
-        key = hashlib.md5(str(kwargs)).hexdigest()
-        return "{}.{}-{}".format(app, model, key)
+        return "{}.{}-{}".format(app, model, changes.generation(self.model))
 
-    def _cache_keys_key(self):
-        app = self.model._meta.app_label
-        model = self.model._meta.object_name
-        return "{}.{}-KEYS".format(app, model)
+    def _cache_key(self, _prefix=None, **kwargs):
+        key = str(kwargs)
+        if self._fields is not None:
+            key += str(sorted(self._fields))
+        key = hashlib.md5(key).hexdigest()
+        return "{}-{}".format(_prefix or self._cache_prefix(), key)
 
     def cached(self, **kwargs):
         key = self._cache_key(**kwargs)
@@ -105,13 +199,32 @@ class RPCManager(models.Manager):
 
         if objects is None:
             objects = self.filter(**kwargs)
-            cache.set(key, objects, self.CACHE_TIMEOUT)
-            existing_keys = cache.get(self._cache_keys_key(), [])
-            existing_keys.append(key)
-            cache.set(self._cache_keys_key(), existing_keys)
+            self._set_cached(key, objects)
 
         return objects
 
+    def _set_cached(self, key, objects):
+        cache.set(key, objects, self.CACHE_TIMEOUT)
+
+    def prime_cache(self, objects, **kwargs):
+        """
+        Store objects we already have as the result of cached(**kwargs)
+
+        Staff.objects.prime_cache([staff], id=staff.id)
+        """
+        self._set_cached(self._cache_key(**kwargs), list(objects))
+
+    def prime_cache_many(self, entries):
+        """
+        prime_cache() for many results at once, with one cache write for
+        all of them
+
+        Staff.objects.prime_cache_many(({'id': staff.id}, [staff]) for staff in members)
+        """
+        prefix = self._cache_prefix()
+        cache.set_many(dict((self._cache_key(prefix, **kwargs), list(objects))
+                            for kwargs, objects in entries), self.CACHE_TIMEOUT)
+
     def get_cached(self, **kwargs):
         result = self.cached(**kwargs)
         if not result:
@@ -123,17 +236,107 @@ class RPCManager(models.Manager):
         return result[0]
 
     def clear_cache(self):
-        existing_keys = cache.get(self._cache_keys_key(), [])
-        for key in existing_keys:
-            cache.delete(key)
+        """
+        Drop every cached result, and have every copy of the rows start
+        over (see changes.py)
+        """
+        changes.record(self.model)
 
-    def values(self):
-        '''
-            This returns only those attrs that have been successfully mapped
-            with the model's fields
+    def invalidate(self, pk=None):
+        """
+        Drop cached results after the platform changed a row, or any rows
+        without pk. The row's own entry is refetched so lookups by pk stay
+        warm
 
-        '''
-        return map(model_to_dict, self.filter())
+        Staff.objects.invalidate(staff.id)
+
+        Every process's replica refetches the row before its next read
+        (see changes.py)
+        """
+        # drops the cached results too
+        changes.record(self.model, pk)
+
+        if pk is not None:
+            # from the platform, this process's replica may not have
+            # caught up
+            objects = self.filter(rpc_kwargs={}, pk=pk)
+            if objects:
+                self.prime_cache(objects, **{self.model._meta.pk.name: pk})
+
+    def evict(self, pk):
+        """
+        Drop cached results after the platform deleted a row, there is
+        nothing to refetch
+
+        Staff.objects.evict(staff_id)
+        """
+        changes.record(self.model, pk)
+
+    def _converters(self, fields):
+        """
+        [(name, row key, field)] for fields, or every field
+        """
+        name_map = getattr(self.model, 'name_map', None) or {}
+        if fields:
+            _fields = []
+            for name in fields:
+                field = self.model.get_field(name)
+                if field is None:
+                    raise ValueError("{} has no field {}".format(
+                        self.model._meta.object_name, name))
+                _fields.append(field)
+        else:
+            _fields = self.model.get_fields()
+        return [(f.name, name_map.get(f.attname) or f.attname, f) for f in _fields]
+
+    def _convert(self, fields, rows):
+        """
+        A tuple of converted values per row, without building models
+        """
+        fields = [(key, field) for name, key, field in self._converters(fields)]
+        columns = convert_columns(fields, rows)
+        return zip(*[columns[key] for key, field in fields]) if rows else []
+
+    def values(self, *fields, **kwargs):
+        """
+        Dicts of field values, for fields or every field, straight from the
+        rows without building models
+
+            Staff.objects.values('id', 'username', is_enabled='1')
+
+        kwargs are filter() arguments
+        """
+        names = [name for name, key, field in self._converters(fields)]
+        manager = self.only(*names) if fields else self
+        rows = manager.raw_filter(**kwargs)
+        return [dict(zip(names, values)) for values in self._convert(fields, rows)]
+
+    def values_list(self, *fields, **kwargs):
+        """
+        Tuples of field values, see values()
+
+            Staff.objects.values_list('id', flat=True)
+            Staff.objects.values_list('id', 'username', named=True)
+
+        flat returns the values of a single field, named returns read only
+        rows with the fields as attributes (see row_type)
+        """
+        flat = kwargs.pop('flat', False)
+        named = kwargs.pop('named', False)
+        if flat and len(fields) != 1:
+            raise TypeError("'flat' is only valid with a single field")
+
+        manager = self.only(*fields) if fields else self
+        rows = manager.raw_filter(**kwargs)
+        values = self._convert(fields, rows)
+
+        if flat:
+            return [value for value, in values]
+        if named:
+            row_class = row_type(
+                self.model, [name for name, key, field in self._converters(fields)])
+            return [row_class._make(value) for value in values]
+        return list(values)
 
     def count(self, **kwargs):
         return len(self.filter(**kwargs))
@@ -190,24 +393,30 @@ class RPCManager(models.Manager):
         filters.update(kwargs)
         _filters = self.convert_filters(filters)
 
-        params = {
-            'batch_results': True,
-            'batch_size': page_size,
-            'batch': page,
-            'sort_by': sort_by,
-            'sort_desc': sort_desc,
-            'filters': _filters,
-        }
+        replica = self.replica
+        if replica is not None:
+            results = replica.query(_filters, sort_by, sort_desc)
+            total = len(results)
+            results = paginate(results, page, page_size)
+        else:
+            params = {
+                'batch_results': True,
+                'batch_size': page_size,
+                'batch': page,
+                'sort_by': sort_by,
+                'sort_desc': sort_desc,
+                'filters': _filters,
+            }
 
-        rpc_response = self.rpc_call(params)
-        if not rpc_response:
-            return 0, 0, []
+            rpc_response = self.rpc_call(params, rpc_kwargs=self._projection_kwargs())
+            if not rpc_response:
+                return 0, 0, []
 
-        total, results = rpc_response
+            total, results = rpc_response
 
         num_pages = int(math.ceil(total / float(page_size)))
 
-        models = map(self.model, results)
+        models = self._build(results)
 
         return total, num_pages, models
 
@@ -249,6 +458,23 @@ class RPCManager(models.Manager):
         return converted
 
 
+_row_types = {}
+
+
+def row_type(model, names):
+    """
+    Read only row class with names as attributes, namedtuples keep their
+    values in the tuple and have empty __slots__, so rows cost no more
+    than tuples
+    """
+    key = (model, tuple(names))
+    try:
+        return _row_types[key]
+    except KeyError:
+        row_class = namedtuple('{}Row'.format(model._meta.object_name), names)
+        return _row_types.setdefault(key, row_class)
+
+
 class SimpleManager(object):
     """ takes a simple list of dicts and maps them to a model
         then allows filtering on them. only does basic filtering
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.utils.cache import patch_cache_control
+
+
+class StaticCacheControlMiddleware(object):
+    """
+    Lets browsers and proxies keep content hashed static files for
+    STATIC_MAX_AGE, their name changes whenever their content does
+    """
+
+    def process_response(self, request, response):
+        if response.status_code != 200 or not request.path.startswith(settings.STATIC_URL):
+            return response
+
+        is_hashed = getattr(staticfiles_storage, 'is_hashed', None)
+        if is_hashed and is_hashed(request.path[len(settings.STATIC_URL):]):
+            patch_cache_control(response, public=True, max_age=settings.STATIC_MAX_AGE)
+        return response
@@ -3,19 +3,38 @@ import json
 from decimal import Decimal
 
 from django import forms
-from django.conf import settings
 from django.core import validators, exceptions
 from django.core.urlresolvers import reverse, NoReverseMatch
 from django.db import models
 from django.db.models.fields import BLANK_CHOICE_DASH
+from django.db.models.fields.subclassing import Creator
 from django.utils.text import capfirst
 from django.utils.translation import ugettext_lazy as _
 
-from pytz import common_timezones
-
+from . import choices
 from . import filters
 from . import managers
 from . import forms as common_forms
+from .conversion import TWO_PLACES
+
+
+_descriptor_attnames = {}
+
+
+def descriptor_attnames(cls):
+    """
+    attnames of cls's SubfieldBase fields, whose descriptor runs to_python
+    again on every assignment
+    """
+    try:
+        return _descriptor_attnames[cls]
+    except KeyError:
+        attnames = frozenset(
+            field.attname for field in cls._meta.fields
+            if any(isinstance(klass.__dict__.get(field.name), Creator)
+                   for klass in cls.__mro__)
+        )
+        return _descriptor_attnames.setdefault(cls, attnames)
 
 
 class RPCModel(models.Model):
@@ -69,6 +88,11 @@ class RPCModel(models.Model):
         return None
 
     def __init__(self, *args, **kwargs):
+        # fields to convert, the rest are left None (see RPCManager.only)
+        only = kwargs.pop('_only', None)
+        # {row key: value} converted already (see conversion.py)
+        converted = kwargs.pop('_converted', None) or {}
+
         if not kwargs:
             if args and isinstance(args[0], dict):
                 kwargs = args[0].copy()
@@ -84,14 +108,21 @@ class RPCModel(models.Model):
 
         # Now we're left with the unprocessed fields that *must* come from
         # keywords, or default.
+        direct_attnames = descriptor_attnames(self.__class__)
 
         for field in fields_iter:
-            if kwargs:
-                if hasattr(self, 'name_map') and self.name_map.get(field.attname):
-                    attname = self.name_map[field.attname]
-                else:
-                    attname = field.attname
+            if hasattr(self, 'name_map') and self.name_map.get(field.attname):
+                attname = self.name_map[field.attname]
+            else:
+                attname = field.attname
 
+            if only is not None and field.name not in only:
+                kwargs.pop(attname, None)
+                # bypass the SubfieldBase descriptor and its to_python
+                self.__dict__[field.attname] = None
+                continue
+
+            if kwargs:
                 try:
                     val = kwargs.pop(attname)
                 except KeyError:
@@ -99,11 +130,20 @@ class RPCModel(models.Model):
                     # default argument on pop because we don't want
                     # get_default() to be evaluated, and then not used.
                     # Refs #12057.
-                    val = field.get_default()
+                    val = field.to_python(field.get_default())
+                else:
+                    if attname in converted:
+                        val = converted[attname]
+                    else:
+                        val = field.to_python(val)
             else:
-                val = field.get_default()
+                val = field.to_python(field.get_default())
 
-            setattr(self, field.attname, field.to_python(val))
+            if field.attname in direct_attnames:
+                # converted already, skip the descriptor's to_python
+                self.__dict__[field.attname] = val
+            else:
+                setattr(self, field.attname, val)
 
         if kwargs:
             for prop in list(kwargs):
@@ -249,7 +289,7 @@ class DecimalField(SortableMixin, models.DecimalField):
     def to_python(self, value):
         value = super(DecimalField, self).to_python(value)
         if value:
-            return value.quantize(Decimal('0.00'))
+            return value.quantize(TWO_PLACES)
         return value
 
 
@@ -287,39 +327,55 @@ class SimpleManagerField(models.Field):
         return managers.SimpleManager(self._model, value)
 
 
-class CityField(models.CharField):
+class LazyChoicesMixin(object):
+    """
+    For fields whose choices are a shared choices.LazyChoices table,
+    validates against its set of values instead of scanning the choices
+    """
+
+    def validate(self, value, model_instance):
+        if not isinstance(self._choices, choices.LazyChoices):
+            # given its own choices
+            return super(LazyChoicesMixin, self).validate(value, model_instance)
+
+        if not self.editable:
+            # Skip validation for non-editable fields.
+            return
+
+        if value not in self.empty_values and value not in self._choices.values:
+            raise exceptions.ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+
+        if value is None and not self.null:
+            raise exceptions.ValidationError(self.error_messages['null'], code='null')
+
+        if not self.blank and value in self.empty_values:
+            raise exceptions.ValidationError(self.error_messages['blank'], code='blank')
+
+
+class CityField(LazyChoicesMixin, models.CharField):
     __metaclass__ = models.SubfieldBase
 
     def __init__(self, *args, **kwargs):
-        cities = [(code, data['name'])
-                  for code, data in settings.SUPPORTED_CITIES.items()]
-        cities = sorted(cities, key=lambda city: city[1])
-
         defaults = {
-            'choices': cities,
+            'choices': choices.CITIES,
         }
         defaults.update(kwargs)
         super(CityField, self).__init__(*args, **defaults)
 
 
-class TimezoneField(models.CharField):
+class TimezoneField(LazyChoicesMixin, models.CharField):
     __metaclass__ = models.SubfieldBase
 
     def __init__(self, *args, **kwargs):
         supported_cities_only = kwargs.pop('supported_cities_only', False)
         if supported_cities_only:
-            timezones = list(
-                set(
-                    (data['timezone'], data['timezone'])
-                    for data in settings.SUPPORTED_CITIES.values()
-                    if 'timezone' in data
-                )
-            )
+            timezones = choices.CITY_TIMEZONES
         else:
-            timezones = [(timezone, timezone)
-                         for timezone in common_timezones]
-
-        timezones = sorted(timezones, key=lambda timezone: timezone[1])
+            timezones = choices.TIMEZONES
 
         defaults = {
             'choices': timezones,
@@ -329,36 +385,23 @@ class TimezoneField(models.CharField):
         super(TimezoneField, self).__init__(*args, **defaults)
 
 
-class CityLocaleField(models.CharField):
+class CityLocaleField(LazyChoicesMixin, models.CharField):
     __metaclass__ = models.SubfieldBase
 
     def __init__(self, *args, **kwargs):
-        locales = list(
-            set(
-                (data['locale'], data['locale'])
-                for data in settings.SUPPORTED_CITIES.values()
-                if 'locale' in data
-            )
-        )
-        locales = sorted(locales, key=lambda locale: locale[1])
-
         defaults = {
-            'choices': locales
+            'choices': choices.CITY_LOCALES
         }
         defaults.update(kwargs)
         super(CityLocaleField, self).__init__(*args, **defaults)
 
 
-class CountryCodeField(SortableMixin, models.CharField):
+class CountryCodeField(SortableMixin, LazyChoicesMixin, models.CharField):
     __metaclass__ = models.SubfieldBase
 
     def __init__(self, *args, **kwargs):
-        country_codes = sorted(
-            settings.COUNTRY_CODES.items(), key=lambda c: c[1]
-        )
-
         defaults = {
-            'choices': country_codes,
+            'choices': choices.COUNTRY_CODES,
         }
         defaults.update(kwargs)
         super(CountryCodeField, self).__init__(*args, **defaults)
@@ -506,8 +549,13 @@ class ForeignKey(models.Field):
 
     def rpc_choices(self):
         pk_name = self.related_model._meta.pk.name
+        objects = self.related_model.objects
+        choice_fields = getattr(self.related_model, 'choice_fields', None)
+        if choice_fields is not None:
+            objects = objects.only(*choice_fields)
+        # cached, so forms don't refetch every row (see utils/warmup.py)
         choices = [(getattr(model_inst, pk_name), str(model_inst))
-                   for model_inst in self.related_model.objects.all()]
+                   for model_inst in objects.cached()]
         return list(choices)
 
     def get_choices_default(self):
@@ -0,0 +1,152 @@
+from decimal import Decimal, InvalidOperation
+
+
+#==============================================================================
+# Local evaluation of platform filters
+#==============================================================================
+
+
+def parse_value(value):
+    """
+    Split a converted filter value into operator and operand
+
+    Input:
+
+        'like:DBK'
+
+    Output:
+
+        'like', 'DBK'
+
+    Values without a known prefix are 'is' filters (see filters.Is)
+    """
+    if isinstance(value, basestring):
+        operator, sep, operand = value.partition(':')
+        if sep and operator in OPERATORS:
+            return operator, operand
+    return 'is', value
+
+
+def _coerce(value, operand):
+    """
+    Convert the textual operand to something comparable with value
+    """
+    if isinstance(value, bool):
+        return value, operand in ('1', 'true', 'True', True)
+    if isinstance(value, (int, long)):
+        try:
+            return value, int(operand)
+        except (TypeError, ValueError):
+            pass
+    if isinstance(value, (int, long, float, Decimal)):
+        try:
+            return Decimal(str(value)), Decimal(str(operand))
+        except InvalidOperation:
+            pass
+    return unicode(value), unicode(operand)
+
+
+def _equal(value, operand):
+    if value is None:
+        return operand in (None, '', 'None')
+    value, operand = _coerce(value, operand)
+    return value == operand
+
+
+def _like(value, operand):
+    if value is None:
+        return False
+    return unicode(operand).lower() in unicode(value).lower()
+
+
+def _in(value, operand):
+    if isinstance(operand, basestring):
+        operand = operand.split(',')
+    return any(_equal(value, o) for o in operand)
+
+
+def _gte(value, operand):
+    if value is None:
+        return False
+    value, operand = _coerce(value, operand)
+    return value >= operand
+
+
+def _lte(value, operand):
+    if value is None:
+        return False
+    value, operand = _coerce(value, operand)
+    return value <= operand
+
+
+def _not(value, operand):
+    return not _equal(value, operand)
+
+
+OPERATORS = {
+    'is': _equal,
+    'equal': _equal,
+    'like': _like,
+    'in': _in,
+    'gte': _gte,
+    'lte': _lte,
+    'not': _not,
+}
+
+
+def compile_filters(filters, key_map=None):
+    """
+    Turn the output of RPCManager.convert_filters into a list of
+    (row key, test, operand) tuples so rows can be checked without
+    reparsing the filter values each time
+
+    key_map maps field names to the keys used in raw rows (see
+    RPCModel.name_map)
+    """
+    key_map = key_map or {}
+    compiled = []
+    for field, value in filters or []:
+        operator, operand = parse_value(value)
+        compiled.append((key_map.get(field, field), OPERATORS[operator], operand))
+    return compiled
+
+
+def matches(row, compiled):
+    for key, test, operand in compiled:
+        if not test(row.get(key), operand):
+            return False
+    return True
+
+
+def run_query(rows, filters=None, sort_by=None, sort_desc=False,
+              key_map=None):
+    """
+    Evaluate platform style filters and sorting against raw rows
+
+    rows - iterable of dicts as returned by the platform
+    filters - list of (field, value) as built by RPCManager.convert_filters
+    sort_by - field to sort by, None keeps the original order
+    sort_desc - whether to sort descending
+
+    Returns a new list of the matching rows
+    """
+    compiled = compile_filters(filters, key_map)
+    if compiled:
+        results = [row for row in rows if matches(row, compiled)]
+    else:
+        results = list(rows)
+
+    if sort_by:
+        key = (key_map or {}).get(sort_by, sort_by)
+        results.sort(key=lambda row: (row.get(key) is None, row.get(key)),
+                     reverse=bool(sort_desc))
+    return results
+
+
+def paginate(rows, page, page_size):
+    """
+    Slice a page out of rows, pages are numbered from 1 like
+    RPCManager.get_page
+    """
+    start = (max(int(page), 1) - 1) * page_size
+    return rows[start:start + page_size]
@@ -0,0 +1,220 @@
+"""
+Local replicas of small, read-heavy platform tables.
+
+A replica keeps every row of a manager's table in memory and a background
+thread keeps it current. When the manager declares a modified field, the
+thread asks the platform only for rows changed since the last sync, and
+runs a full sync every few rounds to drop deleted rows. Once the first
+sync is done, RPCManager.filter() and get_page() are answered locally
+with the same filter semantics as the platform (see query.py).
+
+Rows platform events report changed or deleted are refetched before the
+replica is next read, in whichever process it lives (see changes.py).
+
+Replicas are opt in per model:
+
+    RPC_REPLICAS = {
+        'staff.Staff': {'interval': 60, 'full_every': 10, 'max_age': 180},
+    }
+
+A failed sync is retried as a full one. While the last successful sync is
+older than max_age seconds, reads go to the platform instead.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from . import changes
+from .query import parse_value, run_query
+
+logger = logging.getLogger(__name__)
+
+_replicas = {}
+_replicas_lock = threading.Lock()
+
+
+class Replica(object):
+
+    def __init__(self, manager, interval=60, full_every=10, max_age=None):
+        self.manager = manager
+        self.interval = interval
+        self.full_every = full_every
+        self.max_age = max_age if max_age is not None else interval * 3
+        self.key_map = getattr(manager.model, 'name_map', None) or {}
+        self.pk = manager.model._meta.pk.name
+        self.modified_field = getattr(manager, 'replica_modified_field', None)
+
+        # swapped as a whole by sync(), readers need no lock
+        self._rows = ()
+        self._by_pk = {}
+
+        self.watermark = None
+        # of the changes applied, see changes.py
+        self.generation = None
+        self.synced_at = None
+        self.syncs = 0
+        self.attempts = 0
+        self.failures = 0
+        self.ready = threading.Event()
+        self._sync_lock = threading.Lock()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._rows)
+
+    def is_fresh(self):
+        synced_at = self.synced_at
+        return synced_at is not None and time.time() - synced_at <= self.max_age
+
+    def _row_pk(self, row):
+        return unicode(row.get(self.key_map.get(self.pk, self.pk)))
+
+    def fetch(self, filters):
+        params = {
+            'batch_results': False,
+            'sort_by': None,
+            'sort_desc': False,
+            'filters': filters,
+        }
+        return self.manager.preprocess_rpc_response(self.manager.rpc_call(params))
+
+    def sync(self, full=False):
+        """
+        Pull changed rows from the platform, or every row when full
+        """
+        with self._sync_lock:
+            full = full or self.modified_field is None or self.watermark is None
+
+            if full:
+                # changes recorded from here on are applied by catch_up()
+                generation = changes.generation(self.manager.model)
+                rows = self.fetch([])
+                by_pk = {}
+            else:
+                rows = self.fetch([(self.modified_field, 'gte:{}'.format(self.watermark))])
+                by_pk = self._by_pk.copy()
+
+            for row in rows:
+                by_pk[self._row_pk(row)] = row
+
+            if self.modified_field is not None:
+                key = self.key_map.get(self.modified_field, self.modified_field)
+                modified = [row[key] for row in rows if row.get(key) is not None]
+                if modified:
+                    latest = max(modified)
+                    if self.watermark is None or latest > self.watermark:
+                        self.watermark = latest
+
+            self._rows = tuple(by_pk.itervalues())
+            self._by_pk = by_pk
+            if full:
+                self.generation = generation
+            self.syncs += 1
+            self.synced_at = time.time()
+            self.ready.set()
+            return len(rows)
+
+    def catch_up(self):
+        """
+        Refetch the rows changed since the last sync, or everything when
+        the changes can't be told
+        """
+        generation, pks = changes.since(self.manager.model, self.generation)
+        if pks is None:
+            with self._sync_lock:
+                if self.generation == generation:
+                    # another thread caught up meanwhile
+                    return
+            self.sync(full=True)
+        elif pks:
+            self.refresh(pks, generation)
+
+    def refresh(self, pks, generation):
+        """
+        Refetch the rows pks, dropping those the platform no longer has
+        """
+        with self._sync_lock:
+            if self.generation is not None and self.generation >= generation:
+                return
+            rows = self.fetch([(self.pk, 'in:{}'.format(','.join(sorted(pks))))])
+
+            by_pk = self._by_pk.copy()
+            for pk in pks:
+                by_pk.pop(pk, None)
+            for row in rows:
+                by_pk[self._row_pk(row)] = row
+
+            self._rows = tuple(by_pk.itervalues())
+            self._by_pk = by_pk
+            self.generation = generation
+
+    def tick(self):
+        """
+        A round of the background sync
+        """
+        self.attempts += 1
+        # after a failure the rows missed can't be told, start over
+        full = self.failures > 0 or self.attempts % self.full_every == 0
+        try:
+            self.sync(full=full)
+            self.failures = 0
+        except Exception:
+            self.failures += 1
+            logger.exception("Syncing the %s replica failed (%d in a row)",
+                             self.manager.model._meta.object_name, self.failures)
+
+    def _run(self):
+        while True:
+            self.tick()
+            time.sleep(self.interval)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run,
+                name='replica-{}'.format(self.manager.model._meta.object_name))
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _candidates(self, filters):
+        """
+        Rows that can match filters, looked up by pk when filtered on it
+        """
+        for field, value in filters:
+            if field == self.pk:
+                operator, operand = parse_value(value)
+                if operator in ('is', 'equal'):
+                    row = self._by_pk.get(unicode(operand))
+                    return (row,) if row is not None else ()
+        return self._rows
+
+    def query(self, filters=None, sort_by=None, sort_desc=False):
+        """
+        Evaluate converted filters (see RPCManager.convert_filters) against
+        the local rows
+        """
+        filters = filters or []
+        return run_query(self._candidates(filters), filters, sort_by,
+                         sort_desc, self.key_map)
+
+
+def get_replica(manager):
+    """
+    The running replica for manager's model, None if it isn't replicated
+    """
+    label = '{}.{}'.format(manager.model._meta.app_label,
+                           manager.model._meta.object_name)
+    options = getattr(settings, 'RPC_REPLICAS', {}).get(label)
+    if options is None:
+        return None
+
+    replica = _replicas.get(label)
+    if replica is None:
+        with _replicas_lock:
+            replica = _replicas.get(label)
+            if replica is None:
+                replica = _replicas[label] = Replica(manager, **options)
+                replica.start()
+    return replica
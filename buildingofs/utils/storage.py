@@ -0,0 +1,87 @@
+"""
+Static files storage backed by a manifest of hashed names.
+
+collectstatic writes the name -> hashed name mapping of every file it
+processed (including the compiled pipeline packages) to a json manifest
+next to the files. The manifest is read once when the storage is set up
+and url() is then a dictionary lookup, where PipelineCachedStorage goes to
+the cache and, on a miss, opens and hashes the file.
+"""
+import json
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import CachedFilesMixin
+from django.core.files.base import ContentFile
+
+from pipeline.storage import PipelineCachedStorage
+
+MANIFEST_VERSION = 1
+
+
+class ManifestPipelineStorage(PipelineCachedStorage):
+    manifest_name = 'staticfiles.json'
+
+    def __init__(self, *args, **kwargs):
+        super(ManifestPipelineStorage, self).__init__(*args, **kwargs)
+        self.load_manifest()
+
+    def read_manifest(self):
+        """
+        Returns the {name: hashed name} mapping, empty when there's no
+        usable manifest
+        """
+        if not self.exists(self.manifest_name):
+            return {}
+        with self.open(self.manifest_name) as f:
+            try:
+                manifest = json.loads(f.read().decode('utf-8'))
+            except ValueError:
+                return {}
+        if manifest.get('version') != MANIFEST_VERSION:
+            return {}
+        return manifest['paths']
+
+    def load_manifest(self):
+        base_url = super(CachedFilesMixin, self).url
+        paths = self.read_manifest()
+        # replaced as a whole and never changed, readers need no lock
+        self._urls = dict((name, base_url(hashed)) for name, hashed in paths.iteritems())
+        self._hashed = frozenset(paths.itervalues())
+
+    def save_manifest(self, paths):
+        content = json.dumps({'version': MANIFEST_VERSION, 'paths': paths},
+                             indent=1, sort_keys=True)
+        if self.exists(self.manifest_name):
+            self.delete(self.manifest_name)
+        self._save(self.manifest_name, ContentFile(content))
+
+    def is_hashed(self, name):
+        return name in self._hashed
+
+    def url(self, name, force=False):
+        if force or not settings.DEBUG:
+            try:
+                return self._urls[name]
+            except KeyError:
+                pass
+        return super(ManifestPipelineStorage, self).url(name, force)
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            return
+
+        # urls inside the css being processed must come from the new files,
+        # not the last build
+        self._urls = {}
+        hashed_paths = {}
+        try:
+            processed_files = super(ManifestPipelineStorage, self).post_process(
+                paths, dry_run, **options)
+            for name, hashed_name, processed in processed_files:
+                if hashed_name and not isinstance(processed, Exception):
+                    hashed_paths[name.replace('\\', '/')] = hashed_name
+                yield name, hashed_name, processed
+
+            self.save_manifest(hashed_paths)
+        finally:
+            self.load_manifest()
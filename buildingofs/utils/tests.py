@@ -0,0 +1,566 @@
+import datetime
+import json
+import os
+import shutil
+import tempfile
+import time
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import (ImproperlyConfigured, PermissionDenied,
+                                    ValidationError)
+from django.http import HttpResponse
+from django.test import SimpleTestCase
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
+
+from buildingofs import ofsapi
+from buildingofs.ofsapi.fake import FakeRPCProxy, build_platform
+from nameko.exceptions import RemoteError
+from django.utils import timezone
+from django.utils.tzinfo import FixedOffset
+from django.views.generic import View
+
+from buildingofs.staff.models import Staff
+
+from . import changes, compilers, conversion, replica, warmup
+from .models import (CountryCodeField, DateField, DateTimeField, DecimalField,
+                     IntegerField, PennyField)
+from .storage import MANIFEST_VERSION, ManifestPipelineStorage
+from .views import PermissionsMixin, compile_permissions
+
+
+class ConversionTest(SimpleTestCase):
+
+    def assertAgrees(self, field, values):
+        expected = [field.to_python(value) for value in values]
+        convert = conversion.value_converter(field)
+        # repr tells Decimal('1.5') from Decimal('1.50')
+        self.assertEqual(map(repr, [convert(value) for value in values]), map(repr, expected))
+        self.assertEqual(map(repr, conversion.column_converter(field)(values)),
+                         map(repr, expected))
+
+    def test_decimal(self):
+        field = DecimalField(max_digits=10, decimal_places=2, null=True)
+        self.assertAgrees(field, ['12.345', '12.345', 7, 1, True, 0, '0', '0.00',
+                                  12.5, Decimal('1.005'), Decimal('3'), None])
+
+    def test_penny(self):
+        field = PennyField(max_digits=10, decimal_places=2, null=True)
+        self.assertAgrees(field, [1234, 1234, '1234', 5, 1, 0, '0', -250,
+                                  Decimal('12.3'), Decimal('12.30')])
+        # fails the same way row by row
+        with self.assertRaises(TypeError):
+            field.to_python(None)
+        with self.assertRaises(TypeError):
+            conversion.column_converter(field)([None])
+
+    def test_date(self):
+        field = DateField(null=True)
+        self.assertAgrees(field, ['2014-03-01', '2014-03-01', datetime.date(2014, 3, 1),
+                                  datetime.datetime(2014, 3, 1, 10, 30), None])
+
+    def test_datetime(self):
+        field = DateTimeField(null=True)
+        self.assertAgrees(field, ['2014-03-01 10:30:00+00:00', '2014-03-01 10:30:00+00:00',
+                                  '2014-03-01T10:30:00.250+01:00',
+                                  datetime.datetime(2014, 3, 1, 10, 30, tzinfo=timezone.utc),
+                                  # the same instant
+                                  datetime.datetime(2014, 3, 1, 11, 30, tzinfo=FixedOffset(60)),
+                                  None])
+
+    def test_convert_columns(self):
+        fields = [('amount', PennyField(max_digits=10, decimal_places=2, null=True)),
+                  ('count', IntegerField(default=3))]
+        rows = [{'amount': 150, 'count': '2'}, {'amount': 5}, {'amount': 150}]
+        columns = conversion.convert_columns(fields, rows)
+        self.assertEqual(columns['amount'], [Decimal('1.5'), Decimal('0.05'), Decimal('1.5')])
+        self.assertEqual(columns['count'], [2, 3, 3])
+
+
+@override_settings(COUNTRY_CODES={'gb': 'United Kingdom', 'ie': 'Ireland'})
+class LazyChoicesTest(SimpleTestCase):
+
+    def test_lazy_choices(self):
+        field = CountryCodeField(max_length=2)
+        self.assertEqual(field.clean('ie', None), 'ie')
+        with self.assertRaises(ValidationError):
+            field.clean('fr', None)
+
+    def test_own_choices(self):
+        field = CountryCodeField(max_length=2, choices=[('fr', 'France')])
+        self.assertEqual(field.clean('fr', None), 'fr')
+        with self.assertRaises(ValidationError):
+            field.clean('gb', None)
+        with self.assertRaises(ValidationError):
+            field.clean('', None)
+
+
+class PermissionsView(PermissionsMixin, View):
+    permissions = {'all': ['staff.view'], 'POST': ('staff.change',),
+                   'any': ['homes.view', 'homes.change'], 'GET': []}
+
+    def get(self, request):
+        return HttpResponse('ok')
+
+    post = get
+
+
+class PermissionsMixinTest(SimpleTestCase):
+
+    def request(self, method, codes):
+        request = getattr(RequestFactory(), method)('/')
+        request.user = Staff({'id': 1, 'all_permission_codes': codes})
+        return request
+
+    def assertAllowed(self, method, codes):
+        response = PermissionsView.as_view()(self.request(method, codes))
+        self.assertEqual(response.content, 'ok')
+
+    def assertDenied(self, method, codes):
+        with self.assertRaises(PermissionDenied):
+            PermissionsView.as_view()(self.request(method, codes))
+
+    def test_compiled(self):
+        self.assertEqual(PermissionsView._compiled_permissions, {
+            'all': frozenset(['staff.view']),
+            'POST': frozenset(['staff.change']),
+            'any': frozenset(['homes.view', 'homes.change']),
+        })
+        self.assertIsNone(compile_permissions(None))
+        with self.assertRaises(ImproperlyConfigured):
+            compile_permissions(['staff.view'])
+        with self.assertRaises(ImproperlyConfigured):
+            compile_permissions({'all': 'staff.view'})
+
+    def test_dispatch(self):
+        self.assertAllowed('get', ['staff.view', 'homes.change'])
+        self.assertDenied('get', ['staff.view'])
+        self.assertDenied('get', ['homes.view'])
+        self.assertDenied('post', ['staff.view', 'homes.view'])
+        self.assertAllowed('post', ['staff.view', 'staff.change', 'homes.view'])
+
+        request = self.request('get', [])
+        request.user = AnonymousUser()
+        with self.assertRaises(PermissionDenied):
+            PermissionsView.as_view()(request)
+
+    def test_no_any_requirement(self):
+        class View(PermissionsView):
+            permissions = {'all': ['staff.view']}
+        response = View.as_view()(self.request('get', ['staff.view']))
+        self.assertEqual(response.content, 'ok')
+
+
+class ChangesTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.generation = changes.generation(Staff)
+
+    def test_since(self):
+        changes.record(Staff, 5)
+        changes.record(Staff, '6')
+        generation, pks = changes.since(Staff, self.generation)
+        self.assertEqual(generation, self.generation + 2)
+        self.assertEqual(pks, set([u'5', u'6']))
+        self.assertEqual(changes.since(Staff, generation), (generation, set()))
+
+    def test_start_over(self):
+        changes.record(Staff)
+        self.assertIsNone(changes.since(Staff, self.generation)[1])
+        self.assertIsNone(changes.since(Staff, None)[1])
+
+        generation = changes.record(Staff, 5)
+        cache.delete('staff.Staff-CHANGE-{}'.format(generation))
+        self.assertIsNone(changes.since(Staff, generation - 1)[1])
+
+    def test_lost_generation(self):
+        seen = changes.record(Staff, 5)
+        cache.clear()
+        # generations restart from the time, later than any seen so far
+        time.sleep(0.01)
+        generation, pks = changes.since(Staff, seen)
+        self.assertGreater(generation, seen)
+        self.assertIsNone(pks)
+
+
+@override_settings(RPC_REPLICAS={'staff.Staff': {'interval': 60, 'full_every': 10}})
+class ReplicaTest(SimpleTestCase):
+
+    def setUp(self):
+        self.previous = ofsapi.install(FakeRPCProxy(build_platform({'datasets': {'staff': 5}})))
+        self.replica = replica.Replica(Staff.objects, interval=60, full_every=10)
+        self.replica.modified_field = 'modified_at'
+        self.fetches = []
+        self.fail = False
+
+        fetch = self.replica.fetch
+
+        def record_fetch(filters):
+            self.fetches.append(filters)
+            if self.fail:
+                raise IOError("platform down")
+            return fetch(filters)
+        self.replica.fetch = record_fetch
+
+    def tearDown(self):
+        ofsapi.install(self.previous)
+
+    def test_failed_sync_retried_in_full(self):
+        self.replica.tick()
+        self.replica.tick()
+        self.assertEqual(self.fetches[0], [])
+        self.assertNotEqual(self.fetches[1], [])
+
+        self.fail = True
+        self.replica.tick()
+        self.replica.tick()
+        self.assertEqual(self.replica.failures, 2)
+
+        self.fail = False
+        self.replica.tick()
+        self.assertEqual(self.fetches[-1], [])
+        self.assertEqual(self.replica.failures, 0)
+        self.assertEqual(len(self.replica), 5)
+
+    def test_stale_replica_unused(self):
+        replica._replicas['staff.Staff'] = self.replica
+        self.addCleanup(replica._replicas.clear)
+        self.replica.sync()
+        self.assertIs(Staff.objects.replica, self.replica)
+
+        self.replica.synced_at -= self.replica.max_age + 1
+        self.assertIsNone(Staff.objects.replica)
+
+
+class FakePlatformTest(SimpleTestCase):
+
+    def test_unknown_method(self):
+        rpc = FakeRPCProxy(build_platform({'datasets': {'staff': 5}}))
+        with self.assertRaises(RemoteError) as context:
+            rpc.staff.fire_everyone()
+        self.assertEqual(context.exception.exc_type, 'MethodNotFound')
+
+
+class OnlyDeferTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.platform = build_platform({'datasets': {'staff': 5}})
+        self.previous = ofsapi.install(FakeRPCProxy(self.platform))
+
+        self.sent = []
+        key = ('staff', 'query_staff_members')
+        query = self.platform.handlers[key]
+
+        def record_query(**kwargs):
+            self.sent.append(kwargs)
+            return query(**kwargs)
+        self.platform.handlers[key] = record_query
+
+    def tearDown(self):
+        ofsapi.install(self.previous)
+
+    def test_only(self):
+        staff = Staff.objects.only('first_name').get(id=2)
+        self.assertEqual(staff.id, 2)
+        self.assertTrue(staff.first_name)
+        self.assertIsNone(staff.last_name)
+        self.assertIsNone(staff.username)
+        with self.assertRaises(ValueError):
+            Staff.objects.only('nickname')
+
+    def test_defer(self):
+        staff = Staff.objects.defer('first_name').get(id=2)
+        self.assertIsNone(staff.first_name)
+        self.assertTrue(staff.last_name)
+        self.assertEqual(staff.id, 2)
+
+    def test_fields_sent_when_supported(self):
+        Staff.objects.only('first_name').filter()
+        self.assertNotIn('fields', self.sent[-1])
+
+        manager = Staff.objects.only('first_name')
+        manager.fields_kwarg = 'fields'
+        members = manager.filter()
+        self.assertEqual(self.sent[-1]['fields'], ['first_name', 'id'])
+        self.assertEqual(len(members), 5)
+        self.assertIsNone(members[0].last_name)
+
+    def test_cached_on_the_projection(self):
+        self.assertIsNone(Staff.objects.only('first_name').cached()[0].last_name)
+        self.assertTrue(Staff.objects.cached()[0].last_name)
+
+
+class ValuesTest(SimpleTestCase):
+
+    def setUp(self):
+        self.previous = ofsapi.install(FakeRPCProxy(build_platform({'datasets': {'staff': 5}})))
+        self.members = Staff.objects.filter()
+
+    def tearDown(self):
+        ofsapi.install(self.previous)
+
+    def test_values_agree_with_models(self):
+        names = [field.name for field in Staff.get_fields()]
+        expected = [dict((name, getattr(staff, name)) for name in names)
+                    for staff in self.members]
+        self.assertEqual(Staff.objects.values(), expected)
+        self.assertEqual(Staff.objects.values('id', 'username'),
+                         [{'id': staff.id, 'username': staff.username}
+                          for staff in self.members])
+
+    def test_values_list(self):
+        self.assertEqual(Staff.objects.values_list('id', 'is_enabled'),
+                         [(staff.id, staff.is_enabled) for staff in self.members])
+        self.assertEqual(Staff.objects.values_list('id', flat=True),
+                         [staff.id for staff in self.members])
+        self.assertEqual(Staff.objects.values_list('id', flat=True, id=3), [3])
+
+        rows = Staff.objects.values_list('id', 'username', named=True)
+        self.assertEqual([(row.id, row.username) for row in rows],
+                         [(staff.id, staff.username) for staff in self.members])
+        self.assertEqual(rows[0], (self.members[0].id, self.members[0].username))
+
+    def test_bad_fields(self):
+        with self.assertRaises(TypeError):
+            Staff.objects.values_list('id', 'username', flat=True)
+        with self.assertRaises(ValueError):
+            Staff.objects.values('nickname')
+
+
+class ConnectionPoolTest(SimpleTestCase):
+
+    class Pool(object):
+
+        def __init__(self):
+            self.connection = ConnectionPoolTest.Connection()
+            self.released = self.replaced = 0
+
+        def acquire(self, block=False):
+            return self.connection
+
+        def replace(self, connection):
+            self.replaced += 1
+
+    class Connection(object):
+        connection_errors = (IOError,)
+        channel_errors = ()
+
+        def release(self):
+            self.pool.released += 1
+
+    def setUp(self):
+        self.pool = self.Pool()
+        self.pool.connection.pool = self.pool
+        self._get_pool = ofsapi.get_pool
+        ofsapi.get_pool = lambda uri: self.pool
+
+    def tearDown(self):
+        ofsapi.get_pool = self._get_pool
+
+    def test_released(self):
+        with ofsapi.pooled_connection('memory://') as connection:
+            self.assertIs(connection, self.pool.connection)
+        with self.assertRaises(ValueError):
+            with ofsapi.pooled_connection('memory://'):
+                raise ValueError
+        self.assertEqual((self.pool.released, self.pool.replaced), (2, 0))
+
+    def test_broken_connection_replaced(self):
+        with self.assertRaises(IOError):
+            with ofsapi.pooled_connection('memory://'):
+                raise IOError
+        self.assertEqual((self.pool.released, self.pool.replaced), (0, 1))
+
+    def test_pools_dropped_after_fork(self):
+        pool = self._get_pool('memory://')
+        self.assertIs(self._get_pool('memory://'), pool)
+        # as seen from a forked child
+        ofsapi._pools_pid = None
+        self.assertIsNot(self._get_pool('memory://'), pool)
+
+
+class CachedTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.platform = build_platform({'datasets': {'staff': 5}})
+        self.previous = ofsapi.install(FakeRPCProxy(self.platform))
+
+    def tearDown(self):
+        ofsapi.install(self.previous)
+
+    def test_primed_many(self):
+        members = Staff.objects.filter()
+        Staff.objects.prime_cache_many(({'id': staff.id}, [staff]) for staff in members)
+        calls = self.platform.calls
+        self.assertEqual([Staff.objects.get_cached(id=staff.id).id for staff in members],
+                         [staff.id for staff in members])
+        self.assertEqual(self.platform.calls, calls)
+
+    def test_change_drops_cached_results(self):
+        Staff.objects.cached()
+        Staff.objects.get_cached(id=1)
+        calls = self.platform.calls
+        Staff.objects.cached()
+        self.assertEqual(self.platform.calls, calls)
+
+        Staff.objects.evict(2)
+        Staff.objects.cached()
+        self.assertEqual(self.platform.calls, calls + 1)
+        # the row's own entry is only refetched by invalidate()
+        Staff.objects.get_cached(id=1)
+        self.assertEqual(self.platform.calls, calls + 2)
+
+        Staff.objects.invalidate(1)
+        calls = self.platform.calls
+        Staff.objects.get_cached(id=1)
+        self.assertEqual(self.platform.calls, calls)
+
+
+class WarmupTest(SimpleTestCase):
+
+    def setUp(self):
+        self._tasks = warmup.tasks, warmup.process_tasks
+        warmup.tasks, warmup.process_tasks = {}, set()
+        self.ran = []
+        warmup.task('shared')(lambda: self.ran.append('shared'))
+        warmup.task('index', process=True)(lambda: self.ran.append('index'))
+
+    def tearDown(self):
+        warmup.tasks, warmup.process_tasks = self._tasks
+
+    def test_shared_cache_warmed_once(self):
+        self.assertEqual([name for name, seconds, error in warmup.run()], ['shared'])
+        self.assertEqual([name for name, seconds, error in warmup.run(process=True)],
+                         ['index'])
+        self.assertEqual(self.ran, ['shared', 'index'])
+
+    def test_names_and_errors(self):
+        def fail():
+            raise IOError("platform down")
+        warmup.task('shared.failing')(fail)
+
+        results = warmup.run(['shared.'], workers=1)
+        self.assertEqual([(name, type(error)) for name, seconds, error in results],
+                         [('shared.failing', IOError)])
+        results = warmup.run(['shared'], workers=2)
+        self.assertEqual(sorted(name for name, seconds, error in results),
+                         ['shared', 'shared.failing'])
+        self.assertEqual(self.ran, ['shared'])
+
+
+def write(path, content):
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+@override_settings(DEBUG=False)
+class ManifestStorageTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        write(os.path.join(self.root, 'site.css'), 'body {}')
+
+    def storage(self, manifest):
+        if manifest is not None:
+            write(os.path.join(self.root, 'staticfiles.json'), manifest)
+        return ManifestPipelineStorage(location=self.root, base_url='/static/')
+
+    def manifest(self, version=MANIFEST_VERSION):
+        return json.dumps({'version': version, 'paths': {'app.js': 'app.0123456789ab.js'}})
+
+    def test_from_the_manifest(self):
+        storage = self.storage(self.manifest())
+        # there's no app.js to hash, only the manifest knows it
+        self.assertEqual(storage.url('app.js'), '/static/app.0123456789ab.js')
+        self.assertTrue(storage.is_hashed('app.0123456789ab.js'))
+        self.assertFalse(storage.is_hashed('app.js'))
+
+    def test_missing_from_the_manifest(self):
+        hashed = ManifestPipelineStorage(location=self.root, base_url='/static/').url('site.css')
+        self.assertNotEqual(hashed, '/static/site.css')
+        self.assertEqual(self.storage(self.manifest()).url('site.css'), hashed)
+
+    def test_unusable_manifests(self):
+        for manifest in [None, '{"version": 1, "pat', self.manifest(version=0)]:
+            storage = self.storage(manifest)
+            self.assertEqual(storage._urls, {})
+            with self.assertRaises(ValueError):
+                storage.url('app.js')
+
+    def test_debug(self):
+        storage = self.storage(self.manifest())
+        with self.settings(DEBUG=True):
+            self.assertEqual(storage.url('app.js'), '/static/app.js')
+
+
+class SASSCompilerTest(SimpleTestCase):
+
+    def setUp(self):
+        compilers._files.clear()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        settings = self.settings(PIPELINE_SASS_CACHE_DIR=os.path.join(self.root, 'cache'),
+                                 PIPELINE_SASS_BINARY='sass', PIPELINE_SASS_ARGUMENTS='')
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        os.mkdir(os.path.join(self.root, 'partials'))
+        self.site = self.path('site.scss')
+        write(self.site, '@import "partials/colours";\n'
+                         '// @import "partials/unused";\n'
+                         '@import url(fonts.css), "plain.css";\n'
+                         'body { color: $text; }')
+        write(self.path('partials/_colours.scss'), '$text: black;')
+        write(self.path('partials/_unused.scss'), '$unused: red;')
+        self.outfile = self.path('site.css')
+
+        self.compiled = []
+        self.compiler = compilers.IncrementalSASSCompiler(verbose=False, storage=None)
+        self.compiler.execute_command = self.compile
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def compile(self, command, cwd=None):
+        outfile = command.rsplit(':', 1)[1]
+        self.compiled.append(outfile)
+        write(outfile, 'compiled {}'.format(len(self.compiled)))
+
+    def touch(self, name, content):
+        write(self.path(name), content)
+        # mtime may not have moved on within the same second
+        compilers._files.clear()
+
+    def test_dependencies(self):
+        self.assertEqual(sorted(compilers.dependencies(self.site)),
+                         sorted([os.path.realpath(self.site),
+                                 os.path.realpath(self.path('partials/_colours.scss'))]))
+
+    def test_compiled_when_a_dependency_changes(self):
+        self.compiler.compile_file(self.site, self.outfile)
+        self.compiler.compile_file(self.site, self.outfile)
+        self.assertEqual(len(self.compiled), 1)
+
+        self.touch('partials/_colours.scss', '$text: blue;')
+        self.compiler.compile_file(self.site, self.outfile)
+        self.assertEqual(len(self.compiled), 2)
+        with open(self.outfile) as f:
+            self.assertEqual(f.read(), 'compiled 2')
+
+    def test_earlier_styles_copied_back(self):
+        self.compiler.compile_file(self.site, self.outfile)
+        self.touch('partials/_colours.scss', '$text: blue;')
+        self.compiler.compile_file(self.site, self.outfile)
+        self.touch('partials/_colours.scss', '$text: black;')
+        self.compiler.compile_file(self.site, self.outfile)
+
+        self.assertEqual(len(self.compiled), 2)
+        with open(self.outfile) as f:
+            self.assertEqual(f.read(), 'compiled 1')
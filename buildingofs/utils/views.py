@@ -1,29 +1,94 @@
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import ImproperlyConfigured, PermissionDenied
+
 from braces.views import MultiplePermissionsRequiredMixin
 
 
+def compile_permissions(permissions):
+    """
+    Validate a view's permissions dict and freeze every requirement
+
+    Input:
+
+        {'all': ('staff.view',), 'POST': ['staff.change']}
+
+    Output:
+
+        {'all': frozenset(['staff.view']), 'POST': frozenset(['staff.change'])}
+
+    Empty requirements are dropped. Returns None if permissions is None.
+    """
+    if permissions is None:
+        return None
+
+    if not isinstance(permissions, dict):
+        raise ImproperlyConfigured(
+            "'PermissionsMixin' requires 'permissions' attribute to be set "
+            "to a dict.")
+
+    compiled = {}
+    for key, perms in permissions.items():
+        if perms and not isinstance(perms, (list, tuple, set, frozenset)):
+            raise ImproperlyConfigured(
+                "'PermissionsMixin' requires permissions dict '%s' value to "
+                "be a list or tuple." % key)
+        if perms:
+            compiled[key] = frozenset(perms)
+    return compiled
+
+
+class PermissionsMixinBase(type):
+    """ Compiles the permissions of each view class when it is created """
+
+    def __new__(mcs, name, bases, attrs):
+        cls = super(PermissionsMixinBase, mcs).__new__(mcs, name, bases, attrs)
+        cls._compiled_permissions = compile_permissions(cls.permissions)
+        return cls
+
+
 class PermissionsMixin(MultiplePermissionsRequiredMixin):
     """ A subclass of MultiplePermissionsRequiredMixin that allows an "all"
     tuple to be assigned to any HTTP method (POST, GET, PUT, etc). This mixin
     also changes the default behaviour of self.raise_exception to always raise
-    unless it's set to False """
+    unless it's set to False. Permissions are compiled into frozensets when
+    the view class is created so checking them doesn't allocate. """
+
+    __metaclass__ = PermissionsMixinBase
 
     raise_exception = True
 
+    def handle_no_permission(self, request):
+        if self.raise_exception:
+            raise PermissionDenied
+        return redirect_to_login(request.get_full_path(),
+                                 self.get_login_url(),
+                                 self.get_redirect_field_name())
+
     def dispatch(self, request, *args, **kwargs):
-        self._check_permissions_attr()
-
-        if request.method in self.permissions:
-            perms = self.permissions[request.method]
-            self._check_perms_keys("all", perms)
-            if perms:
-                if not request.user.has_perms(perms):
-                    if self.raise_exception:
-                        raise PermissionDenied
-                    return redirect_to_login(request.get_full_path(),
-                                             self.get_login_url(),
-                                             self.get_redirect_field_name())
-
-        if len(self.permissions.get('any')) == 0:
-            return super(MultiplePermissionsRequiredMixin, self).dispatch(request, *args, **kwargs)
-
-        return super(PermissionsMixin, self).dispatch(request, *args, **kwargs)
+        permissions = self._compiled_permissions
+        if permissions is None:
+            raise ImproperlyConfigured(
+                "'PermissionsMixin' requires 'permissions' attribute to be "
+                "set to a dict.")
+
+        perms_method = permissions.get(request.method)
+        perms_all = permissions.get('all')
+        perms_any = permissions.get('any')
+
+        if perms_method or perms_all or perms_any:
+            user = request.user
+            if not user.is_authenticated():
+                return self.handle_no_permission(request)
+
+            if perms_method and not user.has_perms(perms_method):
+                return self.handle_no_permission(request)
+
+            if perms_all and not user.has_perms(perms_all):
+                return self.handle_no_permission(request)
+
+            if perms_any and not user.has_any_perm(perms_any):
+                return self.handle_no_permission(request)
+
+        # skip MultiplePermissionsRequiredMixin.dispatch, everything it
+        # checks has been checked above
+        return super(MultiplePermissionsRequiredMixin, self).dispatch(request, *args, **kwargs)
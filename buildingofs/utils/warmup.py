@@ -0,0 +1,150 @@
+"""
+Cache warm-up.
+
+After a deploy or a worker restart every cache is cold, and the first
+requests all go to the platform at once. Apps declare what is worth
+fetching ahead of them, in a ``warmup`` module of the app:
+
+    from buildingofs.utils import warmup
+
+    @warmup.task('homepage')
+    def homepage():
+        ...
+
+and managers list the cached() queries they serve most:
+
+    class StaffManager(RPCManager):
+        warm_queries = ({'is_enabled': True},)
+
+``run()`` (the warm_caches command, once per deploy) runs them all,
+WARMUP_WORKERS at a time. The cache is shared, so forked workers don't
+fill it again. Tasks building state of their own process, such as
+in-memory indexes, are registered with ``process=True`` instead:
+
+    @warmup.task('staff.search', process=True)
+
+and ``boot()`` runs those in a freshly forked worker, after connecting to
+the platform, so it takes requests ready:
+
+    # gunicorn.conf.py
+    def post_fork(server, worker):
+        from buildingofs.utils import warmup
+        warmup.boot()
+"""
+import logging
+import threading
+import time
+from Queue import Empty, Queue
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import get_models
+from django.utils.importlib import import_module
+from django.utils.module_loading import module_has_submodule
+
+logger = logging.getLogger(__name__)
+
+# name -> task
+tasks = {}
+# names of the tasks boot() runs in each process
+process_tasks = set()
+
+
+def task(name, process=False):
+    """
+    Decorator registering a function to run when warming caches, or when
+    a worker boots with process
+    """
+    def register(func):
+        tasks[name] = func
+        if process:
+            process_tasks.add(name)
+        else:
+            process_tasks.discard(name)
+        return func
+    return register
+
+
+def _query_task(manager, kwargs):
+    return lambda: manager.cached(**kwargs)
+
+
+def autodiscover():
+    """
+    Import the warmup module of every installed app and register the
+    warm_queries of every model's manager
+    """
+    for app in settings.INSTALLED_APPS:
+        if module_has_submodule(import_module(app), 'warmup'):
+            import_module('{}.warmup'.format(app))
+
+    for model in get_models():
+        manager = model._default_manager
+        for kwargs in getattr(manager, 'warm_queries', ()):
+            name = '{}.{}.cached({})'.format(
+                model._meta.app_label, model._meta.object_name,
+                ', '.join('{}={!r}'.format(*item) for item in sorted(kwargs.items())))
+            tasks[name] = _query_task(manager, kwargs)
+
+
+def run(names=None, workers=None, process=False):
+    """
+    Run the registered tasks warming the shared cache, or with process
+    the ones preparing this process, optionally only those whose name
+    starts with one of names, at most workers at a time
+
+    Returns [(name, seconds, error)] in completion order, errors are also
+    logged and don't stop the other tasks
+    """
+    if workers is None:
+        workers = settings.WARMUP_WORKERS
+
+    pending = Queue()
+    for name in sorted(tasks):
+        if (name in process_tasks) != process:
+            continue
+        if not names or name.startswith(tuple(names)):
+            pending.put(name)
+
+    results = []
+
+    def work():
+        try:
+            while True:
+                try:
+                    name = pending.get_nowait()
+                except Empty:
+                    return
+
+                start = time.time()
+                error = None
+                try:
+                    tasks[name]()
+                except Exception as e:
+                    logger.exception("Warming %s failed", name)
+                    error = e
+                results.append((name, time.time() - start, error))
+        finally:
+            # connections are per thread, don't leave this one open
+            connection.close()
+
+    threads = [threading.Thread(target=work, name='warmup-{}'.format(i))
+               for i in xrange(min(max(workers, 1), pending.qsize()))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def boot():
+    """
+    Prepare a freshly forked worker: connect to the platform and build
+    its in-process state before it takes requests. The shared cache is
+    warmed once per deploy by the warm_caches command
+    """
+    from buildingofs import ofsapi
+
+    ofsapi.post_fork()
+    autodiscover()
+    return run(process=True)
@@ -1,16 +1,14 @@
-from django.template.response import TemplateResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from django.views.generic import View
 
-from buildingofs.blog.models import Post
+from buildingofs.blog.cache import content_etag, content_last_modified
+from buildingofs.blog.views import listing_response
 
 
 class HomepageView(View):
 
+    @method_decorator(condition(etag_func=content_etag,
+                                last_modified_func=content_last_modified))
     def get(self, request):
-
-        posts = Post.objects.filter(live=True)
-        context = {
-            "posts": posts
-        }
-
-        return TemplateResponse(request, 'homepage.html', context)
+        return listing_response(request, 'homepage.html', 'homepage')